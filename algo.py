@@ -1,7 +1,15 @@
-import pygame
 import heapq
 import math
 
+import csr
+import pqueue
+from cache import ResultCache, graph_fingerprint
+from csr import CSRGraph
+from frame_timer import FrameTimer
+from metrics import METRICS, SolverCounters, timed
+from spatial import PointIndex, SpatialGrid
+from worker import ComputeWorker, Job
+
 GRAPH_1 = {
     'V1': {'V2': 5}, 'V2': {'V3': 1}, 'V3': {'V4': 3},
     'V4': {'V2': 6, 'V1' : 3}, 'V5': {'V1': 9, 'V3' : 1, 'V4' : 5},
@@ -20,36 +28,182 @@ POSITIONS_2 = {
     'C' : (150,230), 'D' : (300,220)
 }
 
-def dijkstra(graph, start_node, verbose=False):
+class SolverObserver:
+    # nodes - все вершины графа без копирования (range, ключи словаря или
+    # метки), чтобы поиск с ранней остановкой не платил O(V) за вызов.
+    def on_start(self, nodes):
+        pass
+
+    def on_settle(self, node, distance, changes):
+        pass
+
+    def on_finish(self, distances):
+        pass
+
+    def on_matrices(self, nodes, dist, next_node):
+        pass
+
+    def on_progress(self, done, total):
+        pass
+
+    def on_stale(self, node, distance):
+        pass
+
+class DijkstraTablePrinter(SolverObserver):
+    def on_start(self, nodes):
+        self.sorted_nodes = sorted(nodes)
+        self.snapshot = {node: float('infinity') for node in self.sorted_nodes}
+        self.step = 0
+        self.header = f"{'Шаг':<5} | {'Вершина':<10} | " + " | ".join([f"d({node})" for node in self.sorted_nodes])
+        print("\n--- Таблица работы алгоритма Дейкстры ---")
+        print(self.header)
+        print("-" * len(self.header))
+
+    def on_settle(self, node, distance, changes):
+        self.snapshot.update(changes)
+        row = f"{self.step:<5} | {node:<10} | "
+        dist_values = []
+        for other in self.sorted_nodes:
+            dist = self.snapshot[other]
+            dist_str = "inf" if dist == float('infinity') else str(dist)
+            dist_values.append(f"{dist_str:<5}")
+        row += " | ".join(dist_values)
+        print(row)
+        self.step += 1
+
+    def on_finish(self, distances):
+        print("-" * len(self.header))
+        print("--- Алгоритм Дейкстры завершен ---\n")
+
+class FloydTablePrinter(SolverObserver):
+    def on_matrices(self, nodes, dist, next_node):
+        print("\n--- Алгоритм Флойда-Уоршелла рассчитан для всех пар вершин ---")
+        print("\n--- Матрица расстояний (dist) ---")
+        header = "      " + " ".join([f"{node:<5}" for node in nodes])
+        print(header)
+        print("    -" + "-" * len(header))
+        for i in nodes:
+            row_str = f"{i:<5} |"
+            for j in nodes:
+                val = dist[i][j]
+                row_str += f" {str(val) if val != float('inf') else 'inf':<5}"
+            print(row_str)
+
+        print("\n--- Матрица следующих вершин (next_node) ---")
+        print(header)
+        print("    -" + "-" * len(header))
+        for i in nodes:
+            row_str = f"{i:<5} |"
+            for j in nodes:
+                val = next_node[i][j]
+                row_str += f" {str(val) if val is not None else 'N/A':<5}"
+            print(row_str)
+
+class _LabelledObserver(SolverObserver):
+    def __init__(self, graph, observer):
+        self.labels = graph.labels
+        self.observer = observer
+
+    def on_start(self, nodes):
+        # Решатели CSR передают все вершины, им соответствуют все метки.
+        self.observer.on_start(self.labels)
+
+    def on_settle(self, node, distance, changes):
+        labels = self.labels
+        self.observer.on_settle(labels[node], distance, {labels[k]: d for k, d in changes.items()})
+
+    def on_stale(self, node, distance):
+        self.observer.on_stale(self.labels[node], distance)
+
+    def on_finish(self, distances):
+        labels = self.labels
+        items = distances.items() if isinstance(distances, dict) else enumerate(distances)
+        self.observer.on_finish({labels[i]: d for i, d in items})
+
+def _require_nonnegative(graph):
+    # Словарь может измениться между вызовами, поэтому веса проверяются
+    # каждый раз; min по строке заметно быстрее обхода рёбер в цикле.
+    for neighbors in graph.values():
+        if neighbors and min(neighbors.values()) < 0:
+            raise ValueError("Dijkstra requires non-negative edge weights; use bellman_ford or apsp.johnson")
+
+def _instrument(name, graph, observer):
+    # Пока метрики выключены, решатель получает наблюдателя без изменений.
+    if not METRICS.enabled:
+        return observer
+    return SolverCounters(name, graph, observer)
+
+def _dijkstra_csr(graph, start_node, observer, queue):
+    if observer is not None:
+        observer = _LabelledObserver(graph, observer)
+    distances, predecessors = csr.dijkstra(graph, graph.id_of(start_node), observer, queue)
+    labels = graph.labels
+    return (
+        {labels[i]: d for i, d in enumerate(distances)},
+        {labels[i]: (labels[p] if p >= 0 else None) for i, p in enumerate(predecessors)},
+    )
+
+def _dijkstra_indexed(graph, start_node, observer, priority_queue):
+    distances = {node: float('infinity') for node in graph}
+    distances[start_node] = 0
+    predecessors = {node: None for node in graph}
+    priority_queue.push(start_node, 0)
+
+    if observer is not None:
+        observer.on_start(graph.keys())
+        changes = {start_node: 0}
+
+    while priority_queue:
+        current_distance, current_node = priority_queue.pop()
+
+        if observer is not None:
+            observer.on_settle(current_node, current_distance, changes)
+            changes = {}
+
+        for neighbor, weight in graph[current_node].items():
+            distance = current_distance + weight
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                predecessors[neighbor] = current_node
+                priority_queue.push(neighbor, distance)
+                if observer is not None:
+                    changes[neighbor] = distance
+
+    if observer is not None:
+        observer.on_finish(distances)
+
+    return distances, predecessors
+
+def dijkstra(graph, start_node, verbose=False, observer=None, queue='heapq'):
+    if verbose and observer is None:
+        observer = DijkstraTablePrinter()
+    observer = _instrument('dijkstra', graph, observer)
+    if isinstance(graph, CSRGraph):
+        return _dijkstra_csr(graph, start_node, observer, queue)
+    _require_nonnegative(graph)
+    if queue != 'heapq':
+        weights = (weight for neighbors in graph.values() for weight in neighbors.values())
+        return _dijkstra_indexed(graph, start_node, observer, pqueue.make_queue(queue, weights))
     distances = {node: float('infinity') for node in graph}
     distances[start_node] = 0
     predecessors = {node: None for node in graph}
     priority_queue = [(0, start_node)]
-    
-    if verbose:
-        sorted_nodes = sorted(graph.keys())
-        header = f"{'Шаг':<5} | {'Вершина':<10} | " + " | ".join([f"d({node})" for node in sorted_nodes])
-        print("\n--- Таблица работы алгоритма Дейкстры ---")
-        print(header)
-        print("-" * len(header))
-    
-    step = 0
+
+    if observer is not None:
+        observer.on_start(graph.keys())
+        changes = {start_node: 0}
+
     while priority_queue:
         current_distance, current_node = heapq.heappop(priority_queue)
         
         if current_distance > distances[current_node]:
+            if observer is not None:
+                observer.on_stale(current_node, current_distance)
             continue
 
-        if verbose:
-            row = f"{step:<5} | {current_node:<10} | "
-            dist_values = []
-            for node in sorted_nodes:
-                dist = distances[node]
-                dist_str = "inf" if dist == float('infinity') else str(dist)
-                dist_values.append(f"{dist_str:<5}")
-            row += " | ".join(dist_values)
-            print(row)
-            step += 1
+        if observer is not None:
+            observer.on_settle(current_node, current_distance, changes)
+            changes = {}
             
         for neighbor, weight in graph[current_node].items():
             distance = current_distance + weight
@@ -57,13 +211,26 @@ def dijkstra(graph, start_node, verbose=False):
                 distances[neighbor] = distance
                 predecessors[neighbor] = current_node
                 heapq.heappush(priority_queue, (distance, neighbor))
-                
-    if verbose:
-        print("-" * len(header))
-        print("--- Алгоритм Дейкстры завершен ---\n")
-                
+                if observer is not None:
+                    changes[neighbor] = distance
+
+    if observer is not None:
+        observer.on_finish(distances)
+
     return distances, predecessors
 
+def bellman_ford(graph, start_node):
+    # Как dijkstra, но допускает отрицательные веса; при отрицательном
+    # цикле, достижимом из start_node, бросает NegativeCycleError.
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    distances, predecessors = csr.bellman_ford(graph, graph.id_of(start_node))
+    labels = graph.labels
+    return (
+        {labels[i]: d for i, d in enumerate(distances)},
+        {labels[i]: (labels[p] if p >= 0 else None) for i, p in enumerate(predecessors)},
+    )
+
 def reconstruct_path(predecessors, start_node, end_node):
     path = []
     current_node = end_node
@@ -78,48 +245,236 @@ def reconstruct_path(predecessors, start_node, end_node):
         
     return path[::-1]
 
-def floyd_warshall(graph):
-    nodes = sorted(list(graph.keys()))
-    dist = {u: {v: float('inf') for v in nodes} for u in nodes}
-    next_node = {u: {v: None for v in nodes} for u in nodes}
-
-    for u in nodes:
-        dist[u][u] = 0
-        next_node[u][u] = u
-        for v, weight in graph.get(u, {}).items():
-            dist[u][v] = weight
-            next_node[u][v] = v
-            
-    for k in nodes:
-        for i in nodes:
-            for j in nodes:
-                if dist[i][k] + dist[k][j] < dist[i][j]:
-                    dist[i][j] = dist[i][k] + dist[k][j]
-                    next_node[i][j] = next_node[i][k]
-    
-    print("\n--- Алгоритм Флойда-Уоршелла рассчитан для всех пар вершин ---")
-    print("\n--- Матрица расстояний (dist) ---")
-    header = "      " + " ".join([f"{node:<5}" for node in nodes])
-    print(header)
-    print("    -" + "-" * len(header))
-    for i in nodes:
-        row_str = f"{i:<5} |"
-        for j in nodes:
-            val = dist[i][j]
-            row_str += f" {str(val) if val != float('inf') else 'inf':<5}"
-        print(row_str)
-
-    print("\n--- Матрица следующих вершин (next_node) ---")
-    print(header)
-    print("    -" + "-" * len(header))
-    for i in nodes:
-        row_str = f"{i:<5} |"
-        for j in nodes:
-            val = next_node[i][j]
-            row_str += f" {str(val) if val is not None else 'N/A':<5}"
-        print(row_str)
-
-    return dist, next_node
+def _labels_path(graph, distance, path):
+    if path is None:
+        return distance, None
+    return distance, [graph.label_of(i) for i in path]
+
+def shortest_path(graph, source, target, observer=None):
+    observer = _instrument('shortest_path', graph, observer)
+    if isinstance(graph, CSRGraph):
+        if observer is not None:
+            observer = _LabelledObserver(graph, observer)
+        return _labels_path(graph, *csr.shortest_path(graph, graph.id_of(source), graph.id_of(target), observer))
+    _require_nonnegative(graph)
+    distances = {source: 0}
+    predecessors = {source: None}
+    priority_queue = [(0, source)]
+
+    if observer is not None:
+        observer.on_start(graph.keys())
+        changes = {source: 0}
+
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+
+        if current_distance > distances[current_node]:
+            if observer is not None:
+                observer.on_stale(current_node, current_distance)
+            continue
+        if observer is not None:
+            observer.on_settle(current_node, current_distance, changes)
+            changes = {}
+        if current_node == target:
+            break
+
+        for neighbor, weight in graph.get(current_node, {}).items():
+            distance = current_distance + weight
+            if distance < distances.get(neighbor, float('infinity')):
+                distances[neighbor] = distance
+                predecessors[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
+                if observer is not None:
+                    changes[neighbor] = distance
+
+    if observer is not None:
+        observer.on_finish(distances)
+    if target not in predecessors:
+        return float('infinity'), None
+    return distances[target], reconstruct_path(predecessors, source, target)
+
+def reverse_graph(graph):
+    reverse = {node: {} for node in graph}
+    for node, neighbors in graph.items():
+        for neighbor, weight in neighbors.items():
+            reverse.setdefault(neighbor, {})[node] = weight
+    return reverse
+
+def bidirectional_dijkstra(graph, source, target, reverse=None):
+    if isinstance(graph, CSRGraph):
+        return _labels_path(graph, *csr.bidirectional_dijkstra(graph, graph.id_of(source), graph.id_of(target)))
+    _require_nonnegative(graph)
+    if source == target:
+        return 0, [source]
+    if reverse is None:
+        # Словарь может измениться между запросами, поэтому обратный граф
+        # строится заново; у CSRGraph он кэшируется в reverse().
+        reverse = reverse_graph(graph)
+
+    graphs = (graph, reverse)
+    distances = ({source: 0}, {target: 0})
+    predecessors = ({source: None}, {target: None})
+    queues = ([(0, source)], [(0, target)])
+    best, meeting = float('infinity'), None
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        current_distance, current_node = heapq.heappop(queues[side])
+        dist, other = distances[side], distances[1 - side]
+        if current_distance > dist[current_node]:
+            continue
+
+        for neighbor, weight in graphs[side].get(current_node, {}).items():
+            distance = current_distance + weight
+            if distance < dist.get(neighbor, float('infinity')):
+                dist[neighbor] = distance
+                predecessors[side][neighbor] = current_node
+                heapq.heappush(queues[side], (distance, neighbor))
+                if neighbor in other and distance + other[neighbor] < best:
+                    best, meeting = distance + other[neighbor], neighbor
+
+    if meeting is None:
+        return float('infinity'), None
+    path = reconstruct_path(predecessors[0], source, meeting)
+    current_node = predecessors[1][meeting]
+    while current_node is not None:
+        path.append(current_node)
+        current_node = predecessors[1][current_node]
+    return best, path
+
+def astar(graph, source, target, heuristic=None, observer=None):
+    if heuristic is None:
+        heuristic = lambda node, target: 0
+    observer = _instrument('astar', graph, observer)
+    if isinstance(graph, CSRGraph):
+        labels = graph.labels
+        if observer is not None:
+            observer = _LabelledObserver(graph, observer)
+        return _labels_path(graph, *csr.astar(
+            graph, graph.id_of(source), graph.id_of(target),
+            lambda node: heuristic(labels[node], target), observer))
+    _require_nonnegative(graph)
+    distances = {source: 0}
+    predecessors = {source: None}
+    priority_queue = [(heuristic(source, target), 0, source)]
+
+    if observer is not None:
+        observer.on_start(graph.keys())
+        changes = {source: 0}
+    result = float('infinity'), None
+
+    while priority_queue:
+        _, current_distance, current_node = heapq.heappop(priority_queue)
+
+        if current_distance > distances[current_node]:
+            if observer is not None:
+                observer.on_stale(current_node, current_distance)
+            continue
+        if observer is not None:
+            observer.on_settle(current_node, current_distance, changes)
+            changes = {}
+        if current_node == target:
+            result = current_distance, reconstruct_path(predecessors, source, target)
+            break
+
+        for neighbor, weight in graph.get(current_node, {}).items():
+            distance = current_distance + weight
+            if distance < distances.get(neighbor, float('infinity')):
+                distances[neighbor] = distance
+                predecessors[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance + heuristic(neighbor, target), distance, neighbor))
+                if observer is not None:
+                    changes[neighbor] = distance
+
+    if observer is not None:
+        observer.on_finish(distances)
+    return result
+
+def _graph_edges(graph):
+    if isinstance(graph, CSRGraph):
+        labels = graph.labels
+        for u in range(graph.num_vertices):
+            for v, weight in graph.neighbors(u):
+                yield labels[u], labels[v], weight
+    else:
+        for node, neighbors in graph.items():
+            for neighbor, weight in neighbors.items():
+                yield node, neighbor, weight
+
+def euclidean_heuristic(graph, positions):
+    # Экранные координаты не совпадают с весами, поэтому масштабируем
+    # расстояние так, чтобы оценка не превышала вес ни одного ребра.
+    scale = float('infinity')
+    for node, neighbor, weight in _graph_edges(graph):
+        length = math.dist(positions[node], positions[neighbor])
+        if length > 0:
+            scale = min(scale, weight / length)
+    if scale == float('infinity'):
+        scale = 0
+
+    def heuristic(node, target):
+        return scale * math.dist(positions[node], positions[target])
+    return heuristic
+
+def select_landmarks(graph, count):
+    nodes = list(graph.labels if isinstance(graph, CSRGraph) else graph)
+    if not nodes:
+        return []
+    landmarks = [nodes[0]]
+    nearest = dijkstra(graph, nodes[0])[0]
+    while len(landmarks) < min(count, len(nodes)):
+        candidate = max(
+            (node for node in nodes if node not in landmarks),
+            key=lambda node: nearest[node] if nearest[node] != float('infinity') else -1)
+        landmarks.append(candidate)
+        distances = dijkstra(graph, candidate)[0]
+        nearest = {node: min(nearest[node], distances[node]) for node in nodes}
+    return landmarks
+
+def alt_heuristic(graph, landmarks=None, count=4):
+    if landmarks is None:
+        landmarks = select_landmarks(graph, count)
+    if isinstance(graph, CSRGraph):
+        reverse = graph.reverse()
+    else:
+        reverse = reverse_graph(graph)
+    inf = float('infinity')
+    tables = [(dijkstra(graph, landmark)[0], dijkstra(reverse, landmark)[0]) for landmark in landmarks]
+
+    def heuristic(node, target):
+        best = 0
+        for from_landmark, to_landmark in tables:
+            if from_landmark[target] != inf and from_landmark[node] != inf:
+                best = max(best, from_landmark[target] - from_landmark[node])
+            if to_landmark[node] != inf and to_landmark[target] != inf:
+                best = max(best, to_landmark[node] - to_landmark[target])
+        return best
+    return heuristic
+
+def floyd_warshall(graph, blocked=None, verbose=False, observer=None, compact=False):
+    # При compact=True возвращается apsp.AllPairs: матрицы NumPy вместо
+    # словарей, dist и next_node читаются так же, как словари словарей.
+    if verbose and observer is None:
+        observer = FloydTablePrinter()
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    import apsp
+    with METRICS.timer('floyd_warshall'):
+        nodes, dist_matrix, next_matrix = apsp.dense_matrices(graph)
+        progress = getattr(observer, 'on_progress', None)
+        apsp.solve_dense(dist_matrix, next_matrix, blocked, progress, nodes)
+    if compact:
+        result = apsp.AllPairs(nodes, dist_matrix, next_matrix, graph.integral_weights)
+        dist, next_node = result.dist, result.next_node
+    else:
+        dist, next_node = result = apsp.to_dicts(nodes, dist_matrix, next_matrix, graph.integral_weights)
+
+    if observer is not None:
+        observer.on_matrices(nodes, dist, next_node)
+
+    return result
 
 def reconstruct_floyd_path(next_node, start, end):
     if next_node[start][end] is None:
@@ -137,87 +492,207 @@ SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
 NODE_RADIUS = 20
 FONT_SIZE = 18
 ARROW_SIZE = 15
+# Область для автоматической раскладки: ниже подписей и кнопок.
+GRAPH_AREA = (0, 110, SCREEN_WIDTH, SCREEN_HEIGHT - 140)
 
 WHITE = (255, 255, 255); BLACK = (0, 0, 0); GRAY = (200, 200, 200)
 BLUE = (0, 0, 255); GREEN = (0, 255, 0); RED = (255, 0, 0); PURPLE = (128, 0, 128)
 
 def draw_arrow(screen, color, start, end, width=2):
+    import pygame
     dx = end[0] - start[0]
     dy = end[1] - start[1]
     length = math.sqrt(dx*dx + dy*dy)
-    if length == 0: return 
+    if length == 0: return pygame.Rect(start, (0, 0))
     udx, udy = dx / length, dy / length
     new_end_x = end[0] - udx * (NODE_RADIUS + 2)
     new_end_y = end[1] - udy * (NODE_RADIUS + 2)
-    pygame.draw.line(screen, color, start, (new_end_x, new_end_y), width)
+    line_rect = pygame.draw.line(screen, color, start, (new_end_x, new_end_y), width)
     angle = math.atan2(dy, dx)
     p1 = (new_end_x - ARROW_SIZE * math.cos(angle - math.pi/6), new_end_y - ARROW_SIZE * math.sin(angle - math.pi/6))
     p2 = (new_end_x - ARROW_SIZE * math.cos(angle + math.pi/6), new_end_y - ARROW_SIZE * math.sin(angle + math.pi/6))
-    pygame.draw.polygon(screen, color, [(new_end_x, new_end_y), p1, p2])
-
-def draw_graph(screen, font, graph, positions, selected_start, highlighted_path):
-    def draw_self_loop(screen, font, pos, weight, color, width):
-        loop_radius = 15
-        loop_center = (pos[0], pos[1] - NODE_RADIUS - loop_radius + 5)
-        rect = pygame.Rect(loop_center[0] - loop_radius, loop_center[1] - loop_radius, 2 * loop_radius, 2 * loop_radius)
-        pygame.draw.arc(screen, color, rect, math.radians(60), math.radians(350), width)
-        angle = math.radians(60)
-        arrow_tip_x = loop_center[0] + loop_radius * math.cos(angle)
-        arrow_tip_y = loop_center[1] - loop_radius * math.sin(angle)
-        p1 = (arrow_tip_x - ARROW_SIZE * math.cos(angle - math.pi/6), arrow_tip_y + ARROW_SIZE * math.sin(angle - math.pi/6))
-        p2 = (arrow_tip_x - ARROW_SIZE * math.cos(angle + math.pi/6), arrow_tip_y + ARROW_SIZE * math.sin(angle + math.pi/6))
-        pygame.draw.polygon(screen, color, [(arrow_tip_x, arrow_tip_y), p1, p2])
-        weight_text = font.render(str(weight), True, PURPLE)
-        screen.blit(weight_text, (loop_center[0] + loop_radius, loop_center[1] - loop_radius))
-
+    return line_rect.union(pygame.draw.polygon(screen, color, [(new_end_x, new_end_y), p1, p2]))
+
+def draw_self_loop(screen, font, pos, weight, color, width):
+    import pygame
+    loop_radius = 15
+    loop_center = (pos[0], pos[1] - NODE_RADIUS - loop_radius + 5)
+    rect = pygame.Rect(loop_center[0] - loop_radius, loop_center[1] - loop_radius, 2 * loop_radius, 2 * loop_radius)
+    dirty = pygame.draw.arc(screen, color, rect, math.radians(60), math.radians(350), width)
+    angle = math.radians(60)
+    arrow_tip_x = loop_center[0] + loop_radius * math.cos(angle)
+    arrow_tip_y = loop_center[1] - loop_radius * math.sin(angle)
+    p1 = (arrow_tip_x - ARROW_SIZE * math.cos(angle - math.pi/6), arrow_tip_y + ARROW_SIZE * math.sin(angle - math.pi/6))
+    p2 = (arrow_tip_x - ARROW_SIZE * math.cos(angle + math.pi/6), arrow_tip_y + ARROW_SIZE * math.sin(angle + math.pi/6))
+    dirty.union_ip(pygame.draw.polygon(screen, color, [(arrow_tip_x, arrow_tip_y), p1, p2]))
+    weight_text = font.render(str(weight), True, PURPLE)
+    dirty.union_ip(screen.blit(weight_text, (loop_center[0] + loop_radius, loop_center[1] - loop_radius)))
+    return dirty
+
+def draw_edge(screen, font, graph, positions, node, neighbor, color, width):
+    import pygame
+    start_pos = positions[node]
+    weight = graph[node][neighbor]
+    if node == neighbor:
+        return draw_self_loop(screen, font, start_pos, weight, color, width)
+
+    end_pos = positions[neighbor]
+    if node in graph.get(neighbor, {}):
+        dirty = pygame.draw.line(screen, color, start_pos, end_pos, width)
+        mid_pos_x = (start_pos[0] + end_pos[0]) / 2
+        mid_pos_y = (start_pos[1] + end_pos[1]) / 2
+        w1 = str(graph[node][neighbor]); w2 = str(graph[neighbor][node])
+        weight_text1 = font.render(f"{node}->{neighbor}: {w1}", True, PURPLE)
+        weight_text2 = font.render(f"{neighbor}->{node}: {w2}", True, PURPLE)
+        dirty.union_ip(screen.blit(weight_text1, (mid_pos_x + 5, mid_pos_y - 15)))
+        dirty.union_ip(screen.blit(weight_text2, (mid_pos_x + 5, mid_pos_y + 5)))
+        return dirty
+
+    dirty = draw_arrow(screen, color, start_pos, end_pos, width)
+    mid_pos = ((start_pos[0] + end_pos[0]) / 2, (start_pos[1] + end_pos[1]) / 2)
+    weight_text = font.render(str(weight), True, PURPLE)
+    dirty.union_ip(screen.blit(weight_text, (mid_pos[0] + 5, mid_pos[1] + 5)))
+    return dirty
+
+def draw_node(screen, font, node, pos, selected):
+    import pygame
+    node_color = GREEN if selected else BLUE
+    dirty = pygame.draw.circle(screen, node_color, pos, NODE_RADIUS)
+    pygame.draw.circle(screen, BLACK, pos, NODE_RADIUS, 2)
+    text = font.render(node, True, WHITE)
+    text_rect = text.get_rect(center=pos)
+    screen.blit(text, text_rect)
+    return dirty
+
+def _drawn_orientation(graph, node, neighbor):
+    # Двунаправленное ребро рисуется одной линией, от большей вершины.
+    if node != neighbor and node in graph.get(neighbor, {}) and (neighbor, node) > (node, neighbor):
+        return neighbor, node
+    return node, neighbor
+
+def edge_bounds(font, graph, positions, node, neighbor):
+    # Оценка сверху для прямоугольника, который закрасит draw_edge, без
+    # рисования: используется для отсечения рёбер вне области видимости.
+    import pygame
+    x, y = positions[node]
+    if node == neighbor:
+        label_w, label_h = font.size(str(graph[node][neighbor]))
+        return pygame.Rect(x - 20, y - NODE_RADIUS - 40, 40 + label_w, 45 + label_h)
+    end_x, end_y = positions[neighbor]
+    bounds = pygame.Rect(min(x, end_x), min(y, end_y), abs(end_x - x) + 1, abs(end_y - y) + 1)
+    bounds.inflate_ip(2 * ARROW_SIZE + 8, 2 * ARROW_SIZE + 8)
+    mid_x, mid_y = (x + end_x) / 2, (y + end_y) / 2
+    if node in graph.get(neighbor, {}):
+        label_w = max(font.size(f"{node}->{neighbor}: {graph[node][neighbor]}")[0],
+                      font.size(f"{neighbor}->{node}: {graph[neighbor][node]}")[0])
+        return bounds.union(pygame.Rect(mid_x + 4, mid_y - 16, label_w + 2, font.get_linesize() + 22))
+    label_w, label_h = font.size(str(graph[node][neighbor]))
+    return bounds.union(pygame.Rect(mid_x + 4, mid_y + 4, label_w + 2, label_h + 2))
+
+def draw_graph(screen, font, graph, positions, selected_start, highlighted_path, viewport=None, index=None):
+    # index - PointIndex вершин по positions; без него строится заново.
+    path_edges = set(zip(highlighted_path, highlighted_path[1:])) if highlighted_path else set()
+    edge_rects = {}
     for node, neighbors in graph.items():
-        for neighbor, weight in neighbors.items():
-            start_pos = positions[node]
-            is_path_edge = False
-            if highlighted_path:
-                for i in range(len(highlighted_path) - 1):
-                    if (highlighted_path[i] == node and highlighted_path[i+1] == neighbor):
-                        is_path_edge = True; break
+        for neighbor in neighbors:
+            if _drawn_orientation(graph, node, neighbor) != (node, neighbor):
+                continue
+            if viewport is not None and not viewport.colliderect(edge_bounds(font, graph, positions, node, neighbor)):
+                continue
+            is_path_edge = (node, neighbor) in path_edges
             edge_color = RED if is_path_edge else GRAY
             edge_width = 4 if is_path_edge else 2
-
-            if node == neighbor:
-                draw_self_loop(screen, font, start_pos, weight, edge_color, edge_width)
-            else:
-                end_pos = positions[neighbor]
-                is_bidirectional = neighbor in graph and node in graph.get(neighbor, {})
-                if is_bidirectional and (neighbor, node) > (node, neighbor): continue
-                
-                if is_bidirectional:
-                    pygame.draw.line(screen, edge_color, start_pos, end_pos, edge_width)
-                    mid_pos_x = (start_pos[0] + end_pos[0]) / 2
-                    mid_pos_y = (start_pos[1] + end_pos[1]) / 2
-                    w1 = str(graph[node][neighbor]); w2 = str(graph[neighbor][node])
-                    weight_text1 = font.render(f"{node}->{neighbor}: {w1}", True, PURPLE)
-                    weight_text2 = font.render(f"{neighbor}->{node}: {w2}", True, PURPLE)
-                    screen.blit(weight_text1, (mid_pos_x + 5, mid_pos_y - 15))
-                    screen.blit(weight_text2, (mid_pos_x + 5, mid_pos_y + 5))
-                else:
-                    draw_arrow(screen, edge_color, start_pos, end_pos, edge_width)
-                    mid_pos = ((start_pos[0] + end_pos[0]) / 2, (start_pos[1] + end_pos[1]) / 2)
-                    weight_text = font.render(str(weight), True, PURPLE)
-                    screen.blit(weight_text, (mid_pos[0] + 5, mid_pos[1] + 5))
-                
-    for node, pos in positions.items():
-        node_color = GREEN if node == selected_start else BLUE
-        pygame.draw.circle(screen, node_color, pos, NODE_RADIUS)
-        pygame.draw.circle(screen, BLACK, pos, NODE_RADIUS, 2)
-        text = font.render(node, True, WHITE)
-        text_rect = text.get_rect(center=pos)
-        screen.blit(text, text_rect)
-
-def get_node_at_pos(positions, pos):
-    for node, node_pos in positions.items():
-        if math.sqrt((node_pos[0] - pos[0])**2 + (node_pos[1] - pos[1])**2) <= NODE_RADIUS:
-            return node
-    return None
+            edge_rects[node, neighbor] = draw_edge(screen, font, graph, positions, node, neighbor, edge_color, edge_width)
+
+    node_rects = {}
+    if viewport is None:
+        nodes = positions
+    else:
+        if index is None:
+            index = PointIndex(positions, NODE_RADIUS)
+        nodes = index.query_rect(viewport.inflate(2, 2))
+    for node in nodes:
+        node_rects[node] = draw_node(screen, font, node, positions[node], node == selected_start)
+    return edge_rects, node_rects
+
+class GraphLayer:
+    # Статичный граф рисуется один раз во внеэкранную поверхность. Путь и
+    # выбранная вершина накладываются поверх: в каждом изменённом
+    # прямоугольнике заново рисуются только пересекающие его рёбра и вершины
+    # (их находит сетка из spatial), в том же порядке, что и в draw_graph.
+    def __init__(self, size):
+        self.size = size
+        self.background = None
+        self.surface = None
+        self.scratch = None
+        self.key = None
+        self.edges = SpatialGrid()
+        self.nodes = PointIndex({}, NODE_RADIUS)
+
+    def get(self, font, graph, positions, decorate=None, index=None):
+        import pygame
+        key = (id(graph), id(positions))
+        if self.key != key:
+            with METRICS.timer('render.layer'):
+                self.background = pygame.Surface(self.size)
+                self.background.fill(WHITE)
+                if decorate is not None:
+                    decorate(self.background)
+                self.surface = self.background.copy()
+                edge_rects, node_rects = draw_graph(self.surface, font, graph, positions, None, None,
+                                                    self.surface.get_rect(), index)
+                self.edges = SpatialGrid()
+                for edge, rect in edge_rects.items():
+                    # Красное ребро толще серого, прямоугольник берётся с запасом.
+                    self.edges.insert(edge, rect.inflate(4, 4))
+                self.nodes = PointIndex({node: positions[node] for node in node_rects}, NODE_RADIUS)
+                self.key = key
+        return self.surface
+
+    def restore(self, screen, rects):
+        for rect in rects:
+            screen.blit(self.surface, rect, rect)
+
+    @timed('render.overlay')
+    def draw_overlay(self, screen, font, graph, positions, selected_start, highlighted_path):
+        import pygame
+        path_edges = set()
+        if highlighted_path:
+            path_edges = {edge for edge in zip(highlighted_path, highlighted_path[1:]) if edge in self.edges}
+        dirty = [pygame.Rect(self.edges.rects[edge]) for edge in path_edges]
+        if selected_start in self.nodes.positions:
+            x, y = positions[selected_start]
+            dirty.append(pygame.Rect(x - NODE_RADIUS - 1, y - NODE_RADIUS - 1, 2 * NODE_RADIUS + 3, 2 * NODE_RADIUS + 3))
+
+        # Рисование с обрезкой меняет растеризацию на границе, поэтому
+        # элементы рисуются целиком во вспомогательную поверхность, а на
+        # экран копируется только изменённый прямоугольник.
+        if self.scratch is None:
+            self.scratch = pygame.Surface(self.size)
+        scratch = self.scratch
+        for rect in dirty:
+            scratch.blit(self.background, rect, rect)
+            for node, neighbor in self.edges.query_rect(rect):
+                is_path_edge = (node, neighbor) in path_edges
+                draw_edge(scratch, font, graph, positions, node, neighbor,
+                          RED if is_path_edge else GRAY, 4 if is_path_edge else 2)
+            for node in self.nodes.query_rect(rect.inflate(2, 2)):
+                draw_node(scratch, font, node, positions[node], node == selected_start)
+            screen.blit(scratch, rect, rect)
+        return dirty
+
+def get_node_at_pos(positions, pos, index=None):
+    if index is None:
+        index = PointIndex(positions, NODE_RADIUS)
+    return index.hit(pos)
+
+def _astar_job(graph, source, target, heuristic, build, observer=None):
+    if heuristic is None:
+        heuristic = build()
+    return heuristic, astar(graph, source, target, heuristic, observer)
 
 def main():
+    import pygame
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Визуализация алгоритмов поиска кратчайшего пути")
@@ -227,109 +702,227 @@ def main():
 
     graphs = [(GRAPH_1, POSITIONS_1), (GRAPH_2, POSITIONS_2)]
     current_graph_index = 0
-    current_graph, current_positions = graphs[current_graph_index]
+
+    def select_graph(index):
+        # Граф без заданных вручную координат раскладывается автоматически.
+        graph, positions = graphs[index]
+        if positions is None:
+            import layout
+            positions = layout.layout_positions(graph, GRAPH_AREA, margin=NODE_RADIUS + 10)
+            graphs[index] = (graph, positions)
+        return graph, positions
+
+    current_graph, current_positions = select_graph(current_graph_index)
     
-    algorithms = ["Dijkstra", "Floyd-Warshall"]
+    algorithms = ["Dijkstra", "Floyd-Warshall", "A*", "A* (ALT)"]
     current_algorithm_index = 0
     
-    floyd_distances = None
-    floyd_next_nodes = None
+    floyd_result = None
+
+    heuristics = {}
+    results = ResultCache()
+    fingerprint = None
+
+    # Решатели запускаются в фоновом потоке, чтобы окно не замирало на
+    # больших графах; новый запрос отменяет ещё не завершённый старый.
+    worker = ComputeWorker()
+    pending_floyd_query = None
 
     def precompute_floyd():
-        nonlocal floyd_distances, floyd_next_nodes
-        floyd_distances, floyd_next_nodes = floyd_warshall(current_graph)
+        nonlocal floyd_result, fingerprint, pending_floyd_query
+        fingerprint = graph_fingerprint(current_graph)
+        pending_floyd_query = None
+        cached = results.get(('floyd', fingerprint))
+        if cached is not None:
+            worker.cancel('floyd')
+            floyd_result = cached
+        else:
+            floyd_result = None
+            worker.submit(floyd_warshall, current_graph, compact=True, group='floyd', tag=('floyd', fingerprint))
+
+    def heuristic_builder(name):
+        # Эвристика строится при первом запросе A* к графу, в фоновом потоке.
+        graph, positions = current_graph, current_positions
+        if name == "A*":
+            return lambda: euclidean_heuristic(graph, positions)
+        return lambda: alt_heuristic(graph, count=2)
 
     precompute_floyd()
+    node_index = PointIndex(current_positions, NODE_RADIUS)
 
     start_node = None
     end_node = None
-    shortest_path = None
+    found_path = None
     path_info = ""
 
+    def show_result(source, target, distance, path):
+        nonlocal found_path, path_info
+        if path:
+            found_path = path
+            path_info = f"Путь от {source} до {target}: {' -> '.join(path)}. Длина: {distance}"
+        else:
+            found_path = None
+            path_info = f"Путь от {source} до {target} не найден."
+
+    def show_floyd_result(source, target):
+        path = floyd_result.path(source, target)
+        distance = floyd_result.distance(source, target)
+        print("Результат взят из предварительно рассчитанной матрицы.")
+        show_result(source, target, distance, path)
+
     graph_button_rect = pygame.Rect(SCREEN_WIDTH - 160, 10, 150, 40)
     algo_button_rect = pygame.Rect(SCREEN_WIDTH - 160, 60, 150, 40)
+
+    def draw_buttons(surface):
+        pygame.draw.rect(surface, GRAY, graph_button_rect)
+        pygame.draw.rect(surface, BLACK, graph_button_rect, 2)
+        graph_btn_text = info_font.render(f"Сменить граф", True, BLACK)
+        surface.blit(graph_btn_text, (graph_button_rect.x + 15, graph_button_rect.y + 10))
+
+        pygame.draw.rect(surface, GRAY, algo_button_rect)
+        pygame.draw.rect(surface, BLACK, algo_button_rect, 2)
+        algo_btn_text = info_font.render(f"Алгоритм", True, BLACK)
+        surface.blit(algo_btn_text, (algo_button_rect.x + 35, algo_button_rect.y + 10))
+
+    # Статичный граф рисуется один раз во внеэкранную поверхность, поверх
+    # неё обновляются только путь, выбранная вершина и подписи.
+    graph_layer = GraphLayer((SCREEN_WIDTH, SCREEN_HEIGHT))
+    frame_timer = FrameTimer()
+    drawn_state = None
+    dirty_rects = []
     
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                drawn_state = None
             
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if graph_button_rect.collidepoint(event.pos):
                     current_graph_index = (current_graph_index + 1) % len(graphs)
-                    current_graph, current_positions = graphs[current_graph_index]
-                    start_node = None; end_node = None; shortest_path = None; path_info = ""
+                    current_graph, current_positions = select_graph(current_graph_index)
+                    start_node = None; end_node = None; found_path = None; path_info = ""
+                    worker.cancel('query')
                     precompute_floyd()
+                    heuristics.clear()
+                    node_index = PointIndex(current_positions, NODE_RADIUS)
                     continue
                 
                 if algo_button_rect.collidepoint(event.pos):
                     current_algorithm_index = (current_algorithm_index + 1) % len(algorithms)
-                    start_node = None; end_node = None; shortest_path = None; path_info = ""
+                    start_node = None; end_node = None; found_path = None; path_info = ""
+                    worker.cancel('query')
+                    pending_floyd_query = None
                     continue
 
-                clicked_node = get_node_at_pos(current_positions, event.pos)
+                clicked_node = get_node_at_pos(current_positions, event.pos, node_index)
                 if clicked_node:
                     if not start_node:
+                        worker.cancel('query')
+                        pending_floyd_query = None
                         start_node = clicked_node
-                        shortest_path = None
+                        found_path = None
                         path_info = f"Выбрана начальная вершина: {start_node}. Выберите конечную."
                     elif not end_node and clicked_node != start_node:
                         end_node = clicked_node
                         selected_algorithm = algorithms[current_algorithm_index]
                         print(f"\nЗапуск поиска пути от '{start_node}' до '{end_node}' используя {selected_algorithm}...")
-                        
-                        path = None
-                        distance = float('inf')
+                        found_path = None
+                        path_info = f"Поиск пути от {start_node} до {end_node}..."
 
                         if selected_algorithm == "Dijkstra":
-                            distances, predecessors = dijkstra(current_graph, start_node, verbose=True)
-                            path = reconstruct_path(predecessors, start_node, end_node)
-                            if end_node in distances:
-                                distance = distances[end_node]
+                            # Поиск останавливается на конечной вершине, поэтому
+                            # кэшируется ответ для пары, а не дерево от start_node.
+                            key = ('dijkstra', fingerprint, start_node, end_node)
+                            cached = results.get(key)
+                            if cached is not None:
+                                show_result(start_node, end_node, *cached)
+                            else:
+                                worker.submit(shortest_path, current_graph, start_node, end_node, group='query',
+                                              tag=(key, start_node, end_node))
                         
                         elif selected_algorithm == "Floyd-Warshall":
-                            path = reconstruct_floyd_path(floyd_next_nodes, start_node, end_node)
-                            if start_node in floyd_distances and end_node in floyd_distances[start_node]:
-                                distance = floyd_distances[start_node][end_node]
-                            print("Результат взят из предварительно рассчитанной матрицы.")
-                        
-                        if path:
-                            shortest_path = path
-                            path_info = f"Путь от {start_node} до {end_node}: {' -> '.join(path)}. Длина: {distance}"
+                            if floyd_result is not None:
+                                show_floyd_result(start_node, end_node)
+                            else:
+                                pending_floyd_query = (start_node, end_node)
+
                         else:
-                            shortest_path = None
-                            path_info = f"Путь от {start_node} до {end_node} не найден."
+                            worker.submit(_astar_job, current_graph, start_node, end_node,
+                                          heuristics.get(selected_algorithm), heuristic_builder(selected_algorithm),
+                                          group='query', tag=(('astar', selected_algorithm), start_node, end_node))
                         
                         start_node = None
                         end_node = None
 
-        screen.fill(WHITE)
-        pygame.draw.rect(screen, GRAY, graph_button_rect)
-        pygame.draw.rect(screen, BLACK, graph_button_rect, 2)
-        graph_btn_text = info_font.render(f"Сменить граф", True, BLACK)
-        screen.blit(graph_btn_text, (graph_button_rect.x + 15, graph_button_rect.y + 10))
-
-        pygame.draw.rect(screen, GRAY, algo_button_rect)
-        pygame.draw.rect(screen, BLACK, algo_button_rect, 2)
-        algo_btn_text = info_font.render(f"Алгоритм", True, BLACK)
-        screen.blit(algo_btn_text, (algo_button_rect.x + 35, algo_button_rect.y + 10))
-
-        draw_graph(screen, font, current_graph, current_positions, start_node, shortest_path)
-        
+        for job in worker.poll():
+            if job.state == Job.FAILED:
+                found_path = None
+                path_info = f"Ошибка вычисления: {job.error}"
+            elif job.group == 'floyd' and job.tag == ('floyd', fingerprint):
+                results.put(job.tag, job.result)
+                floyd_result = job.result
+                if pending_floyd_query is not None:
+                    show_floyd_result(*pending_floyd_query)
+                    pending_floyd_query = None
+            elif job.group == 'query':
+                key, source, target = job.tag
+                result = job.result
+                if key[0] == 'astar':
+                    heuristics[key[1]], result = result
+                else:
+                    results.put(key, result)
+                show_result(source, target, *result)
+
+        running_query = worker.current('query')
+        if running_query is not None and running_query.total:
+            source, target = running_query.tag[1:]
+            path_info = (f"Поиск пути от {source} до {target}: обработано "
+                         f"{running_query.done} из {running_query.total} вершин")
+        elif pending_floyd_query is not None:
+            path_info = f"Поиск пути от {pending_floyd_query[0]} до {pending_floyd_query[1]}: ожидание матриц"
+
+        base = graph_layer.get(font, current_graph, current_positions, draw_buttons, node_index)
         current_algo_name = algorithms[current_algorithm_index]
         algo_info_text = f"Алгоритм: {current_algo_name}"
+        floyd_job = worker.current('floyd')
+        if current_algo_name == "Floyd-Warshall" and floyd_job is not None:
+            algo_info_text += f" (расчёт матриц {floyd_job.progress:.0%})"
         user_prompt_text = "Выберите начальную вершину." if not start_node and not path_info else path_info
-
-        algo_surface = info_font.render(algo_info_text, True, BLACK)
-        screen.blit(algo_surface, (10, 10))
-        
-        info_surface = info_font.render(user_prompt_text, True, BLACK)
-        screen.blit(info_surface, (10, 40))
-
-        pygame.display.flip()
+        overlay_lines = METRICS.overlay_lines() if METRICS.enabled else ()
+        state = (base, start_node, found_path, algo_info_text, user_prompt_text, frame_timer.text, overlay_lines)
+
+        if state != drawn_state:
+            frame_timer.start()
+            if drawn_state is None or drawn_state[0] is not base:
+                screen.blit(base, (0, 0))
+                previous_rects = [screen.get_rect()]
+            else:
+                previous_rects = dirty_rects
+                graph_layer.restore(screen, previous_rects)
+
+            dirty_rects = graph_layer.draw_overlay(screen, font, current_graph, current_positions, start_node, found_path)
+            algo_surface = info_font.render(algo_info_text, True, BLACK)
+            dirty_rects.append(screen.blit(algo_surface, (10, 10)))
+            info_surface = info_font.render(user_prompt_text, True, BLACK)
+            dirty_rects.append(screen.blit(info_surface, (10, 40)))
+            timer_surface = info_font.render(frame_timer.text, True, GRAY)
+            dirty_rects.append(screen.blit(timer_surface, (10, SCREEN_HEIGHT - 25)))
+            for i, line in enumerate(reversed(overlay_lines)):
+                metrics_surface = info_font.render(line, True, PURPLE)
+                dirty_rects.append(screen.blit(metrics_surface, (10, SCREEN_HEIGHT - 50 - 22 * i)))
+
+            pygame.display.update(previous_rects + dirty_rects)
+            drawn_state = state
+            frame_timer.stop()
+        else:
+            frame_timer.skip()
         clock.tick(60)
 
+    worker.shutdown()
     pygame.quit()
 
 if __name__ == '__main__':
@@ -0,0 +1,479 @@
+import heapq
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import csr
+from csr import CSRGraph, NegativeCycleError
+
+# --- Плотные матрицы для алгоритма Флойда-Уоршелла ---
+
+NO_NODE = -1
+BLOCKED_THRESHOLD = 512
+BLOCK_SIZE = 256
+PROGRESS_STEP = 64
+
+
+def index_dtype(n):
+    # Самый узкий тип, в который помещаются номера вершин и NO_NODE.
+    if n <= np.iinfo(np.int16).max:
+        return np.int16
+    if n <= np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+def dense_matrices(graph):
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    n = graph.num_vertices
+    order = sorted(range(n), key=graph.label_of)
+    position = np.empty(n, dtype=np.int64)
+    position[order] = np.arange(n)
+
+    dist = np.full((n, n), np.inf)
+    next_node = np.full((n, n), NO_NODE, dtype=index_dtype(n))
+    np.fill_diagonal(dist, 0)
+    np.fill_diagonal(next_node, np.arange(n))
+
+    offsets, targets, weights = graph.as_numpy()
+    rows = position[np.repeat(np.arange(n), np.diff(offsets))]
+    cols = position[targets]
+    dist[rows, cols] = weights
+    next_node[rows, cols] = cols
+
+    labels = [graph.label_of(i) for i in order]
+    return labels, dist, next_node
+
+
+def _relax_tile(dist, next_node, rows, cols, ks):
+    tile = dist[rows, cols]
+    tile_next = next_node[rows, cols]
+    candidate = np.empty_like(tile)
+    improved = np.empty(tile.shape, dtype=bool)
+    for k in range(ks.start, ks.stop):
+        np.add(dist[rows, k, None], dist[k, None, cols], out=candidate)
+        np.less(candidate, tile, out=improved)
+        np.minimum(tile, candidate, out=tile)
+        np.copyto(tile_next, next_node[rows, k, None], where=improved)
+
+
+def floyd_warshall_dense(dist, next_node, progress=None):
+    n = len(dist)
+    everything = slice(0, n)
+    if progress is None:
+        _relax_tile(dist, next_node, everything, everything, everything)
+        return dist, next_node
+    for start in range(0, n, PROGRESS_STEP):
+        ks = slice(start, min(start + PROGRESS_STEP, n))
+        _relax_tile(dist, next_node, everything, everything, ks)
+        progress(ks.stop, n)
+    return dist, next_node
+
+
+def floyd_warshall_blocked(dist, next_node, block_size=BLOCK_SIZE, progress=None):
+    n = len(dist)
+    blocks = [slice(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    for kb in blocks:
+        _relax_tile(dist, next_node, kb, kb, kb)
+        for b in blocks:
+            if b != kb:
+                _relax_tile(dist, next_node, kb, b, kb)
+                _relax_tile(dist, next_node, b, kb, kb)
+        for rb in blocks:
+            if rb == kb:
+                continue
+            for cb in blocks:
+                if cb != kb:
+                    _relax_tile(dist, next_node, rb, cb, kb)
+        if progress is not None:
+            progress(kb.stop, n)
+    return dist, next_node
+
+
+def solve_dense(dist, next_node, blocked=None, progress=None, labels=None):
+    # progress(done, total) вызывается после каждой порции промежуточных
+    # вершин k и может прервать расчёт исключением.
+    # Отрицательное расстояние от вершины до самой себя означает
+    # отрицательный цикл через неё.
+    if blocked is None:
+        blocked = len(dist) >= BLOCKED_THRESHOLD
+    if blocked:
+        floyd_warshall_blocked(dist, next_node, progress=progress)
+    else:
+        floyd_warshall_dense(dist, next_node, progress)
+    negative = np.flatnonzero(np.diagonal(dist) < 0)
+    if len(negative):
+        vertex = labels[negative[0]] if labels is not None else negative[0]
+        raise NegativeCycleError(f"Negative cycle through vertex {vertex}")
+    return dist, next_node
+
+
+def to_dicts(labels, dist, next_node, integral=True):
+    inf = float('inf')
+    dist_dict = {}
+    next_dict = {}
+    for i, u in enumerate(labels):
+        dist_row = dist[i].tolist()
+        next_row = next_node[i].tolist()
+        if integral:
+            dist_row = [int(d) if d != inf else inf for d in dist_row]
+        dist_dict[u] = dict(zip(labels, dist_row))
+        next_dict[u] = {v: (labels[j] if j != NO_NODE else None) for v, j in zip(labels, next_row)}
+    return dist_dict, next_dict
+
+
+# --- Компактный результат для всех пар ---
+#
+# Вместо V² объектов Python хранятся матрица расстояний float64 и матрица
+# следующих вершин минимальной ширины. dist и next_node читаются как
+# словари словарей (dist[u][v], next_node[u][v]), пути строятся лениво.
+
+class _RowView:
+    def __init__(self, owner, matrix, i):
+        self.owner = owner
+        self.matrix = matrix
+        self.i = i
+
+    def __getitem__(self, label):
+        j = self.owner.index_of(label)
+        if j is None:
+            raise KeyError(label)
+        return self.owner._value(self.matrix, self.i, j)
+
+    def __contains__(self, label):
+        return self.owner.index_of(label) is not None
+
+    def __iter__(self):
+        return iter(self.owner.labels)
+
+    def __len__(self):
+        return len(self.owner.labels)
+
+    def get(self, label, default=None):
+        return self[label] if label in self else default
+
+    def items(self):
+        return ((label, self.owner._value(self.matrix, self.i, j)) for j, label in enumerate(self.owner.labels))
+
+
+class _MatrixView:
+    def __init__(self, owner, matrix):
+        self.owner = owner
+        self.matrix = matrix
+
+    def __getitem__(self, label):
+        i = self.owner.index_of(label)
+        if i is None:
+            raise KeyError(label)
+        return _RowView(self.owner, self.matrix, i)
+
+    def __contains__(self, label):
+        return self.owner.index_of(label) is not None
+
+    def __iter__(self):
+        return iter(self.owner.labels)
+
+    def __len__(self):
+        return len(self.owner.labels)
+
+
+class AllPairs:
+    def __init__(self, labels, dist, next_node, integral=True):
+        self.labels = list(labels)
+        self.dist_matrix = dist
+        self.next_matrix = next_node.astype(index_dtype(len(self.labels)), copy=False)
+        self.integral = integral
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self.dist = _MatrixView(self, self.dist_matrix)
+        self.next_node = _MatrixView(self, self.next_matrix)
+
+    @property
+    def nbytes(self):
+        return self.dist_matrix.nbytes + self.next_matrix.nbytes
+
+    def index_of(self, label):
+        return self._index.get(label)
+
+    def _value(self, matrix, i, j):
+        value = matrix[i, j]
+        if matrix is self.next_matrix:
+            return self.labels[value] if value != NO_NODE else None
+        value = float(value)
+        return int(value) if self.integral and value != float('inf') else value
+
+    def _ids(self, source, target):
+        i, j = self.index_of(source), self.index_of(target)
+        if i is None or j is None:
+            raise KeyError(source if i is None else target)
+        return i, j
+
+    def distance(self, source, target):
+        return self._value(self.dist_matrix, *self._ids(source, target))
+
+    def iter_path(self, source, target):
+        # Вершины пути выдаются по одной; для недостижимой цели - ни одной.
+        i, j = self._ids(source, target)
+        next_matrix, labels = self.next_matrix, self.labels
+        if next_matrix[i, j] == NO_NODE:
+            return
+        yield labels[i]
+        while i != j:
+            i = int(next_matrix[i, j])
+            yield labels[i]
+
+    def path(self, source, target):
+        path = list(self.iter_path(source, target))
+        return path or None
+
+    def paths(self, pairs):
+        # Все пути пачки продвигаются на шаг одновременно, по одной
+        # индексации матрицы next_node за шаг.
+        if not pairs:
+            return []
+        ids = np.array([self._ids(s, t) for s, t in pairs], dtype=np.int64)
+        current, targets = ids[:, 0].copy(), ids[:, 1]
+        reachable = self.next_matrix[current, targets] != NO_NODE
+        lengths = np.zeros(len(pairs), dtype=np.int64)
+        steps = [current.copy()]
+        active = reachable & (current != targets)
+        while active.any():
+            current[active] = self.next_matrix[current[active], targets[active]]
+            lengths[active] += 1
+            steps.append(current.copy())
+            active &= current != targets
+        steps = np.stack(steps)
+        labels = self.labels
+        return [[labels[i] for i in steps[:length + 1, k].tolist()] if ok else None
+                for k, (length, ok) in enumerate(zip(lengths.tolist(), reachable.tolist()))]
+
+
+# --- Все пары через Дейкстру из каждой вершины на пуле процессов ---
+
+_shared = {}
+
+
+def first_hops(predecessors, source):
+    hops = [NO_NODE] * len(predecessors)
+    hops[source] = source
+    for node in range(len(predecessors)):
+        chain = []
+        while hops[node] == NO_NODE and predecessors[node] != NO_NODE:
+            chain.append(node)
+            node = predecessors[node]
+        if hops[node] == NO_NODE:
+            continue
+        hop = hops[node]
+        for child in reversed(chain):
+            if node == source:
+                hop = child
+            hops[child] = hop
+            node = child
+    return hops
+
+
+def _solve_sources(graph, dist_out, next_out, sources):
+    n = graph.num_vertices
+    for source in sources:
+        distances, predecessors = csr.dijkstra(graph, source)
+        dist_out[source * n:(source + 1) * n] = array('d', distances)
+        next_out[source * n:(source + 1) * n] = array('q', first_hops(predecessors, source))
+    return len(sources)
+
+
+def _share_arrays(arrays):
+    size = sum(a.itemsize * len(a) for a in arrays)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    layout = []
+    offset = 0
+    for a in arrays:
+        nbytes = a.itemsize * len(a)
+        shm.buf[offset:offset + nbytes] = a.tobytes()
+        layout.append((csr.buffer_typecode(a), offset, nbytes))
+        offset += nbytes
+    return shm, layout
+
+
+def _attach_arrays(shm, layout):
+    return [shm.buf[offset:offset + nbytes].cast(typecode) for typecode, offset, nbytes in layout]
+
+
+def _init_worker(graph_name, graph_layout, out_name, out_layout):
+    graph_shm = shared_memory.SharedMemory(name=graph_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    offsets, targets, weights = _attach_arrays(graph_shm, graph_layout)
+    _shared['segments'] = (graph_shm, out_shm)
+    _shared['graph'] = CSRGraph(offsets, targets, weights)
+    _shared['out'] = _attach_arrays(out_shm, out_layout)
+
+
+def _worker_solve(sources):
+    dist_out, next_out = _shared['out']
+    return _solve_sources(_shared['graph'], dist_out, next_out, sources)
+
+
+def _all_pairs(graph, workers, chunk_size, finish):
+    # finish(dist, next_node) получает матрицы, пока разделяемая память
+    # ещё доступна, и должен скопировать из них всё нужное.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    n = graph.num_vertices
+
+    if workers <= 1 or n < 2:
+        dist = array('d', bytes(8 * n * n))
+        next_node = array('q', bytes(8 * n * n))
+        _solve_sources(graph, memoryview(dist), memoryview(next_node), range(n))
+        return finish(np.frombuffer(dist).reshape(n, n), np.frombuffer(next_node, dtype=np.int64).reshape(n, n))
+
+    graph_shm, graph_layout = _share_arrays([graph.offsets, graph.targets, graph.weights])
+    out_shm = shared_memory.SharedMemory(create=True, size=16 * n * n)
+    out_layout = [('d', 0, 8 * n * n), ('q', 8 * n * n, 8 * n * n)]
+    dist = next_node = None
+    try:
+        if chunk_size is None:
+            chunk_size = max(1, n // (workers * 4))
+        chunks = [range(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(graph_shm.name, graph_layout, out_shm.name, out_layout)) as pool:
+            for _ in pool.map(_worker_solve, chunks):
+                pass
+        dist = np.frombuffer(out_shm.buf, dtype=np.float64, count=n * n).reshape(n, n)
+        next_node = np.frombuffer(out_shm.buf, dtype=np.int64, count=n * n, offset=8 * n * n).reshape(n, n)
+        return finish(dist, next_node)
+    finally:
+        dist = next_node = None
+        for shm in (graph_shm, out_shm):
+            # Если finish бросил исключение, его traceback ещё держит
+            # представления памяти; close тогда бросает BufferError, который
+            # не должен заменить исходную ошибку. Сегмент освободится вместе
+            # с последним представлением, имя удаляется сразу.
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            shm.unlink()
+
+
+def all_pairs_dijkstra(graph, workers=None, chunk_size=None, compact=False):
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    labels = [graph.label_of(i) for i in range(graph.num_vertices)]
+    integral = graph.integral_weights
+
+    def finish(dist, next_node):
+        if compact:
+            return AllPairs(labels, dist.copy(), next_node, integral)
+        return to_dicts(labels, dist, next_node, integral)
+
+    return _all_pairs(graph, workers, chunk_size, finish)
+
+
+# --- Алгоритм Джонсона: все пары при отрицательных весах ---
+
+def johnson(graph, workers=None, chunk_size=None, compact=False):
+    # Потенциалы h из Беллмана-Форда делают веса w + h[u] - h[v]
+    # неотрицательными, дальше работает all_pairs_dijkstra на пуле
+    # процессов. Расстояния переводятся обратно: d - h[u] + h[v].
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    n = graph.num_vertices
+    potentials, _ = csr.bellman_ford(graph)
+    h = np.array(potentials, dtype=np.int64 if graph.integral_weights else np.float64)
+    offsets, targets, weights = graph.as_numpy()
+    sources = np.repeat(np.arange(n), np.diff(offsets))
+    # Погрешность вещественных весов не должна давать отрицательный ноль.
+    reweighted = np.maximum(weights + h[sources] - h[targets], 0)
+    weights_buffer = array(csr.buffer_typecode(graph.weights), reweighted.tobytes())
+    reduced = CSRGraph(graph.offsets, graph.targets, weights_buffer, graph.labels)
+    labels = [graph.label_of(i) for i in range(n)]
+    integral = graph.integral_weights
+
+    def finish(dist, next_node):
+        dist = dist - h[:, None] + h[None, :]
+        if compact:
+            return AllPairs(labels, dist, next_node, integral)
+        return to_dicts(labels, dist, next_node, integral)
+
+    return _all_pairs(reduced, workers, chunk_size, finish)
+
+
+# --- Таблица расстояний многие-ко-многим ---
+
+def _table_ids(graph, nodes):
+    ids = []
+    for node in nodes:
+        node_id = graph.id_of(node)
+        if node_id is None:
+            raise ValueError(f"Unknown vertex: {node}")
+        ids.append(node_id)
+    return ids
+
+
+def _table_dijkstra(graph, source_ids, target_ids, table):
+    # Дейкстра из каждого источника останавливается, как только извлечены
+    # все цели.
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    columns = {}
+    for j, t in enumerate(target_ids):
+        columns.setdefault(t, []).append(j)
+    for i, source in enumerate(source_ids):
+        distances = {source: 0}
+        settled = set()
+        queue = [(0, source)]
+        remaining = len(columns)
+        while queue and remaining:
+            current_distance, u = heapq.heappop(queue)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u in columns:
+                table[i, columns[u]] = current_distance
+                remaining -= 1
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                distance = current_distance + weights[e]
+                if distance < distances.get(v, float('infinity')):
+                    distances[v] = distance
+                    heapq.heappush(queue, (distance, v))
+
+
+def _table_buckets(hierarchy, source_ids, target_ids, table):
+    # Обратный поиск вверх от каждой цели раскладывает расстояния по
+    # "корзинам" вершин; прямой поиск вверх от источника просматривает
+    # корзины пройденных вершин. Работа поисков делится между всеми парами.
+    buckets = {}
+    for j, t in enumerate(target_ids):
+        for u, distance in hierarchy.search_space(t, backward=True).items():
+            buckets.setdefault(u, []).append((j, distance))
+    for i, source in enumerate(source_ids):
+        row = table[i]
+        for u, distance in hierarchy.search_space(source).items():
+            for j, to_target in buckets.get(u, ()):
+                if distance + to_target < row[j]:
+                    row[j] = distance + to_target
+
+
+def distance_table(graph, sources, targets, hierarchy=None):
+    # Возвращает матрицу float64 размером len(sources) x len(targets),
+    # недостижимые пары равны inf. hierarchy - иерархия ch.build(graph).
+    if hierarchy is not None:
+        if not hierarchy.matches(graph):
+            raise ValueError("Hierarchy was built for a different graph")
+        graph = hierarchy.up
+    elif hasattr(graph, 'to_csr'):
+        graph = graph.to_csr()
+    elif not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    if hierarchy is None:
+        csr.require_nonnegative(graph)
+    source_ids = _table_ids(graph, sources)
+    target_ids = _table_ids(graph, targets)
+    table = np.full((len(source_ids), len(target_ids)), np.inf)
+    if hierarchy is not None:
+        _table_buckets(hierarchy, source_ids, target_ids, table)
+    else:
+        _table_dijkstra(graph, source_ids, target_ids, table)
+    return table
@@ -0,0 +1,250 @@
+import argparse
+import heapq
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import algo
+import generators
+from csr import CSRGraph
+from kr2 import Graph
+
+# --- Замеры решателей на синтетических графах ---
+#
+# python bench.py --sizes small --output results.json --compare old.json
+#
+# Для каждого графа и алгоритма сохраняется лучшее время из нескольких
+# запусков, пик памяти по tracemalloc (отдельным запуском, так как
+# tracemalloc замедляет код) и среднее на запрос число вершин, извлечённых
+# из очереди.
+# Ответы сверяются с эталонной реализацией Дейкстры ниже.
+
+SIZES = {
+    'small': [100, 1000],
+    'medium': [1000, 10000],
+    'large': [10000, 100000],
+}
+FLOYD_LIMIT = 500
+DENSE_LIMIT = 1000
+QUERIES = 5
+REGRESSION_RATIO = 1.2
+
+
+def reference_distances(graph, source):
+    # Намеренно простая версия без оптимизаций решателей algo и csr.
+    distances = {source: 0}
+    done = set()
+    queue = [(0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node in done:
+            continue
+        done.add(node)
+        for neighbor, weight in graph[node].items():
+            if neighbor not in distances or distance + weight < distances[neighbor]:
+                distances[neighbor] = distance + weight
+                heapq.heappush(queue, (distances[neighbor], neighbor))
+    return distances
+
+
+class SettleCounter(algo.SolverObserver):
+    def __init__(self):
+        self.settled = 0
+
+    def on_settle(self, node, distance, changes):
+        self.settled += 1
+
+
+def _same(distances, expected):
+    inf = float('infinity')
+    return all(distances.get(node, inf) == expected.get(node, inf) for node in set(distances) | set(expected))
+
+
+def measure(func, repeat):
+    best = float('infinity')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+# --- Случаи замеров: каждый возвращает (функция, извлечений на запрос, проверка) ---
+
+class Workload:
+    def __init__(self, kind, n, seed, workdir):
+        self.graph = generators.generate(kind, n, seed)
+        self.csr_graph = CSRGraph.from_dict(self.graph)
+        rng = random.Random(seed)
+        nodes = list(self.graph)
+        self.sources = [rng.choice(nodes) for _ in range(QUERIES)]
+        self.targets = [rng.choice(nodes) for _ in range(QUERIES)]
+        self.references = {source: reference_distances(self.graph, source) for source in self.sources}
+        self.workdir = workdir
+
+
+def _reachable(distances):
+    return {node: d for node, d in distances.items() if d != float('infinity')}
+
+
+def _case_dijkstra(graph, w):
+    counter = SettleCounter()
+    ok = True
+    for source in w.sources:
+        distances, _ = algo.dijkstra(graph, source, observer=counter)
+        ok = ok and _same(_reachable(distances), w.references[source])
+    return lambda: [algo.dijkstra(graph, source) for source in w.sources], counter.settled / len(w.sources), ok
+
+
+def case_dijkstra(w):
+    return _case_dijkstra(w.graph, w)
+
+
+def case_dijkstra_csr(w):
+    return _case_dijkstra(w.csr_graph, w)
+
+
+def case_shortest_path(w):
+    counter = SettleCounter()
+    ok = True
+    pairs = list(zip(w.sources, w.targets))
+    for source, target in pairs:
+        distance, _ = algo.shortest_path(w.graph, source, target, observer=counter)
+        ok = ok and distance == w.references[source].get(target, float('infinity'))
+    return lambda: [algo.shortest_path(w.graph, s, t) for s, t in pairs], counter.settled / len(pairs), ok
+
+
+def case_reconstruct_path(w):
+    graph, source = w.graph, w.sources[0]
+    _, predecessors = algo.dijkstra(graph, source)
+    ok = True
+    for target, expected in w.references[source].items():
+        path = algo.reconstruct_path(predecessors, source, target)
+        ok = ok and sum(graph[u][v] for u, v in zip(path, path[1:])) == expected
+    return lambda: [algo.reconstruct_path(predecessors, source, node) for node in graph], 0, ok
+
+
+def case_floyd_warshall(w):
+    if len(w.graph) > FLOYD_LIMIT:
+        return None
+    dist, _ = algo.floyd_warshall(w.csr_graph)
+    ok = all(_same(_reachable(dist[source]), w.references[source]) for source in w.sources)
+    return lambda: algo.floyd_warshall(w.csr_graph), 0, ok
+
+
+def case_load_from_file(w):
+    kr2_graph = Graph()
+    kr2_graph.from_csr(w.csr_graph)
+    path = os.path.join(w.workdir, 'graph.txt')
+    kr2_graph.save_to_file(path, 'edge_list')
+
+    def load():
+        Graph().load_from_file(path, 'edge_list')
+
+    loaded = Graph()
+    loaded.load_from_file(path, 'edge_list')
+    ok = loaded.adj_list == kr2_graph.adj_list
+    return load, 0, ok
+
+
+CASES = {
+    'dijkstra': case_dijkstra,
+    'dijkstra_csr': case_dijkstra_csr,
+    'shortest_path': case_shortest_path,
+    'reconstruct_path': case_reconstruct_path,
+    'floyd_warshall': case_floyd_warshall,
+    'load_from_file': case_load_from_file,
+}
+
+
+def run(kinds, sizes, algorithms, repeat=3, seed=0, log=None):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in kinds:
+            for n in sizes:
+                if kind == 'dense' and n > DENSE_LIMIT:
+                    continue
+                w = Workload(kind, n, seed, workdir)
+                for name in algorithms:
+                    case = CASES[name](w)
+                    if case is None:
+                        continue
+                    func, settled, ok = case
+                    seconds, peak = measure(func, repeat)
+                    result = {
+                        'graph': kind, 'nodes': len(w.graph), 'edges': w.csr_graph.num_edges,
+                        'algorithm': name, 'time_ms': round(seconds * 1000, 3),
+                        'peak_kb': round(peak / 1024, 1), 'settled': round(settled, 1), 'ok': ok,
+                    }
+                    results.append(result)
+                    if log is not None:
+                        log(result)
+    return results
+
+
+def compare(results, baseline):
+    # Возвращает строки отчёта и признак найденного замедления.
+    previous = {(r['graph'], r['nodes'], r['algorithm']): r for r in baseline['results']}
+    lines, regressed = [], False
+    for r in results:
+        old = previous.get((r['graph'], r['nodes'], r['algorithm']))
+        if old is None or not old['time_ms']:
+            continue
+        ratio = r['time_ms'] / old['time_ms']
+        mark = ''
+        if ratio > REGRESSION_RATIO:
+            mark, regressed = '  <-- slower', True
+        lines.append(f"{r['graph']:<10} {r['nodes']:>7} {r['algorithm']:<16} "
+                     f"{old['time_ms']:>10.3f} -> {r['time_ms']:>10.3f} ms  x{ratio:.2f}{mark}")
+    return lines, regressed
+
+
+def _print_result(r):
+    status = 'ok' if r['ok'] else 'MISMATCH'
+    print(f"{r['graph']:<10} {r['nodes']:>7} {r['algorithm']:<16} {r['time_ms']:>10.3f} ms "
+          f"{r['peak_kb']:>10.1f} KB  settled {r['settled']:<8} {status}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shortest-path solvers on synthetic graphs.")
+    parser.add_argument('--sizes', choices=sorted(SIZES), default='small')
+    parser.add_argument('--graphs', nargs='+', choices=sorted(generators.GENERATORS), default=list(generators.GENERATORS))
+    parser.add_argument('--algorithms', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="JSON file from a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.graphs, SIZES[args.sizes], args.algorithms, args.repeat, args.seed, _print_result)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    status = 0 if all(r['ok'] for r in results) else 1
+    if args.compare:
+        with open(args.compare) as f:
+            lines, regressed = compare(results, json.load(f))
+        print("\n".join(lines))
+        if regressed:
+            status = status or 2
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
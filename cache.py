@@ -0,0 +1,110 @@
+import hashlib
+import os
+import pickle
+import sys
+from collections import OrderedDict
+
+from csr import CSRGraph, buffer_typecode
+
+# --- Кэш результатов поиска кратчайших путей ---
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def graph_fingerprint(graph):
+    digest = hashlib.sha256()
+    if isinstance(graph, CSRGraph):
+        digest.update(b'csr')
+        digest.update(repr(list(graph.labels)).encode())
+        digest.update(buffer_typecode(graph.weights).encode())
+        for buffer in (graph.offsets, graph.targets, graph.weights):
+            digest.update(bytes(buffer))
+    else:
+        digest.update(b'dict')
+        for node in sorted(graph, key=repr):
+            digest.update(repr(node).encode())
+            digest.update(repr(sorted(graph[node].items(), key=repr)).encode())
+    return digest.hexdigest()
+
+
+def estimate_size(value):
+    # Оценка без сериализации: у массивов и AllPairs берётся nbytes,
+    # контейнеры обходятся рекурсивно.
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __contains__(self, key):
+        return key in self._entries or (self.directory is not None and os.path.exists(self._path(key)))
+
+    def _path(self, key):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, name + '.pickle')
+
+    def _remember(self, key, value, size):
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        if self.directory is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                value = pickle.loads(data)
+                self._remember(key, value, estimate_size(value))
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value, estimate_size(value))
+        if self.directory is not None:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            path = self._path(key)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, self)
+        if value is self:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
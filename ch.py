@@ -0,0 +1,347 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from cache import graph_fingerprint
+from csr import CSRGraph, buffer_typecode, require_nonnegative
+
+# --- Иерархии сжатия (contraction hierarchies) ---
+#
+# Предобработка по очереди "сжимает" вершины в порядке важности: вершина
+# удаляется из графа, а пути через неё, для которых нет обходного пути
+# (свидетеля), заменяются ярлыками u -> w. Запрос - двусторонняя Дейкстра,
+# которая идёт только вверх по рангу: вперёд от источника по рёбрам up и
+# назад от цели по рёбрам down. Ярлыки хранят среднюю вершину и
+# раскрываются в исходный путь.
+
+NO_MIDDLE = -1
+WITNESS_SETTLE_LIMIT = 64
+
+_BINARY_MAGIC = b'CHRG'
+_BINARY_VERSION = 2
+# После числа вершин и рёбер - отпечаток исходного графа (sha256 из
+# cache.graph_fingerprint), по нему проверяется, что файл подходит графу.
+_BINARY_HEADER = struct.Struct('<4sIQQQc7xQ32s')
+
+
+def _as_csr(graph):
+    if isinstance(graph, CSRGraph):
+        return graph
+    if hasattr(graph, 'to_csr'):
+        return graph.to_csr()
+    return CSRGraph.from_dict(graph)
+
+
+# --- Предобработка ---
+
+class _Contractor:
+    def __init__(self, graph):
+        n = graph.num_vertices
+        self.out = [{} for _ in range(n)]
+        self.inn = [{} for _ in range(n)]
+        self.middle = {}
+        for u in range(n):
+            for v, w in graph.neighbors(u):
+                if u != v and w < self.out[u].get(v, float('infinity')):
+                    self.out[u][v] = w
+                    self.inn[v][u] = w
+                    self.middle[u, v] = NO_MIDDLE
+        self.deleted_neighbors = [0] * n
+
+    def _witness(self, source, skip, targets, limit):
+        # Ограниченная Дейкстра по ещё не сжатым вершинам в обход skip;
+        # останавливается, когда все targets извлечены из очереди.
+        out = self.out
+        distances = {source: 0}
+        queue = [(0, source)]
+        settled = 0
+        remaining = len(targets)
+        while queue and settled < WITNESS_SETTLE_LIMIT:
+            distance, u = heapq.heappop(queue)
+            if distance > distances[u]:
+                continue
+            if distance > limit:
+                break
+            settled += 1
+            if u in targets:
+                remaining -= 1
+                if not remaining:
+                    break
+            for v, w in out[u].items():
+                if v == skip:
+                    continue
+                candidate = distance + w
+                if candidate < distances.get(v, float('infinity')):
+                    distances[v] = candidate
+                    heapq.heappush(queue, (candidate, v))
+        return distances
+
+    def shortcuts(self, v):
+        out, inn = self.out[v], self.inn[v]
+        if not out or not inn:
+            return []
+        max_out = max(out.values())
+        found = []
+        for u, w_in in inn.items():
+            distances = self._witness(u, v, out, w_in + max_out)
+            for w, w_out in out.items():
+                if w != u and distances.get(w, float('infinity')) > w_in + w_out:
+                    found.append((u, w, w_in + w_out))
+        return found
+
+    def priority(self, v):
+        # Разность рёбер плюс число уже сжатых соседей: так вершины
+        # сжимаются равномерно по всему графу.
+        return len(self.shortcuts(v)) - len(self.out[v]) - len(self.inn[v]) + self.deleted_neighbors[v]
+
+    def contract(self, v):
+        for u, w, weight in self.shortcuts(v):
+            if weight < self.out[u].get(w, float('infinity')):
+                self.out[u][w] = weight
+                self.inn[w][u] = weight
+                self.middle[u, w] = v
+        up, down = self.out[v], self.inn[v]
+        for w in up:
+            del self.inn[w][v]
+            self.deleted_neighbors[w] += 1
+        for u in down:
+            del self.out[u][v]
+            self.deleted_neighbors[u] += 1
+        return up, down
+
+
+def _rows_to_csr(rows, middle, reverse, labels, typecode):
+    offsets, targets, weights, middles = array('q', [0]), array('q'), array(typecode), array('q')
+    for node, row in enumerate(rows):
+        for other, w in sorted(row.items()):
+            targets.append(other)
+            weights.append(w)
+            middles.append(middle[(other, node) if reverse else (node, other)])
+        offsets.append(len(targets))
+    return CSRGraph(offsets, targets, weights, labels), middles
+
+
+def build(graph, observer=None):
+    # observer.on_progress(done, total) вызывается по мере сжатия вершин.
+    graph = _as_csr(graph)
+    require_nonnegative(graph)
+    n = graph.num_vertices
+    contractor = _Contractor(graph)
+    queue = [(contractor.priority(v), v) for v in range(n)]
+    heapq.heapify(queue)
+    rank = array('q', [0] * n)
+    up_rows, down_rows = [None] * n, [None] * n
+    contracted = 0
+    while queue:
+        _, v = heapq.heappop(queue)
+        # Ленивое обновление: приоритет пересчитывается при извлечении, и
+        # вершина откладывается, если перестала быть минимальной.
+        priority = contractor.priority(v)
+        if queue and priority > queue[0][0]:
+            heapq.heappush(queue, (priority, v))
+            continue
+        rank[v] = contracted
+        up_rows[v], down_rows[v] = contractor.contract(v)
+        contracted += 1
+        if observer is not None and contracted % 256 == 0:
+            observer.on_progress(contracted, n)
+    typecode = buffer_typecode(graph.weights)
+    up, up_middle = _rows_to_csr(up_rows, contractor.middle, False, graph.labels, typecode)
+    down, down_middle = _rows_to_csr(down_rows, contractor.middle, True, graph.labels, typecode)
+    return ContractionHierarchy(rank, up, up_middle, down, down_middle, graph_fingerprint(graph))
+
+
+# --- Иерархия и запросы ---
+
+class ContractionHierarchy:
+    def __init__(self, rank, up, up_middle, down, down_middle, fingerprint=None):
+        self.rank = rank
+        self.up = up
+        self.up_middle = up_middle
+        self.down = down
+        self.down_middle = down_middle
+        self.fingerprint = fingerprint
+
+    def matches(self, graph):
+        return self.fingerprint is not None and self.fingerprint == graph_fingerprint(_as_csr(graph))
+
+    @property
+    def num_vertices(self):
+        return self.up.num_vertices
+
+    @property
+    def labels(self):
+        return self.up.labels
+
+    @property
+    def num_shortcuts(self):
+        return sum(1 for m in self.up_middle if m != NO_MIDDLE) + sum(1 for m in self.down_middle if m != NO_MIDDLE)
+
+    def search_space(self, node, backward=False):
+        # Полный поиск только вверх по рангу от node: расстояния до всех
+        # достижимых вершин (по рёбрам down при backward=True).
+        g = self.down if backward else self.up
+        offsets, targets, weights = g.offsets, g.targets, g.weights
+        distances = {node: 0}
+        queue = [(0, node)]
+        settled = {}
+        while queue:
+            current_distance, u = heapq.heappop(queue)
+            if u in settled:
+                continue
+            settled[u] = current_distance
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                distance = current_distance + weights[e]
+                if distance < distances.get(v, float('infinity')):
+                    distances[v] = distance
+                    heapq.heappush(queue, (distance, v))
+        return settled
+
+    def _search(self, source, target):
+        # Возвращает расстояние, вершину встречи и предшественников обеих
+        # сторон; поиск останавливается, когда минимумы очередей не меньше
+        # лучшего найденного пути.
+        graphs = (self.up, self.down)
+        distances = ({source: 0}, {target: 0})
+        predecessors = ({source: -1}, {target: -1})
+        queues = ([(0, source)], [(0, target)])
+        best, meeting = float('infinity'), (source if source == target else -1)
+        if source == target:
+            best = 0
+        while queues[0] or queues[1]:
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            current_distance, u = heapq.heappop(queues[side])
+            if current_distance >= best:
+                queues[side].clear()
+                continue
+            dist, other = distances[side], distances[1 - side]
+            if current_distance > dist[u]:
+                continue
+            if u in other and current_distance + other[u] < best:
+                best, meeting = current_distance + other[u], u
+            g = graphs[side]
+            offsets, targets, weights = g.offsets, g.targets, g.weights
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                distance = current_distance + weights[e]
+                if distance < dist.get(v, float('infinity')):
+                    dist[v] = distance
+                    predecessors[side][v] = u
+                    heapq.heappush(queues[side], (distance, v))
+        return best, meeting, predecessors
+
+    def _edge_middle(self, u, v):
+        # Ребро u -> v хранится у вершины с меньшим рангом.
+        if self.rank[u] < self.rank[v]:
+            graph, middles, node, other = self.up, self.up_middle, u, v
+        else:
+            graph, middles, node, other = self.down, self.down_middle, v, u
+        for e in range(graph.offsets[node], graph.offsets[node + 1]):
+            if graph.targets[e] == other:
+                return middles[e]
+        raise ValueError(f"No hierarchy edge {u} -> {v}")
+
+    def _unpack(self, path):
+        result = [path[0]]
+        stack = list(zip(path, path[1:]))[::-1]
+        while stack:
+            u, v = stack.pop()
+            middle = self._edge_middle(u, v)
+            if middle == NO_MIDDLE:
+                result.append(v)
+            else:
+                stack.append((middle, v))
+                stack.append((u, middle))
+        return result
+
+    def query_ids(self, source, target):
+        best, meeting, predecessors = self._search(source, target)
+        if meeting == -1:
+            return float('infinity'), None
+        path = []
+        node = meeting
+        while node != -1:
+            path.append(node)
+            node = predecessors[0][node]
+        path.reverse()
+        node = predecessors[1][meeting]
+        while node != -1:
+            path.append(node)
+            node = predecessors[1][node]
+        return best, self._unpack(path)
+
+    def query(self, source, target):
+        # Принимает и возвращает метки вершин, как algo.shortest_path.
+        source_id, target_id = self.up.id_of(source), self.up.id_of(target)
+        if source_id is None or target_id is None:
+            raise ValueError(f"Unknown vertex: {source if source_id is None else target}")
+        distance, path = self.query_ids(source_id, target_id)
+        if path is None:
+            return distance, None
+        labels = self.labels
+        return distance, [labels[i] for i in path]
+
+    # --- Бинарный формат: ранги + рёбра up и down со средними вершинами ---
+
+    def save(self, filepath):
+        labels = b''
+        if not isinstance(self.labels, range):
+            import json
+            labels = json.dumps(list(self.labels), ensure_ascii=False).encode('utf-8')
+        weight_typecode = buffer_typecode(self.up.weights)
+        header = _BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, self.num_vertices, self.up.num_edges,
+                                     self.down.num_edges, weight_typecode.encode(), len(labels),
+                                     bytes.fromhex(self.fingerprint or '00' * 32))
+        # Как в CSRGraph.save: прерванная запись не оставляет обрезанный
+        # файл, а иерархия может быть отображена из того же файла.
+        with open(filepath + '.tmp', 'wb') as f:
+            f.write(header)
+            f.write(bytes(self.rank))
+            for g, middles in ((self.up, self.up_middle), (self.down, self.down_middle)):
+                for buffer in (g.offsets, g.targets, g.weights, middles):
+                    f.write(bytes(buffer))
+            f.write(labels)
+        os.replace(filepath + '.tmp', filepath)
+
+    @classmethod
+    def open(cls, filepath):
+        if sys.byteorder != 'little':
+            raise ValueError("Hierarchy files are little-endian only")
+        with open(filepath, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapping) < _BINARY_HEADER.size:
+            raise ValueError("Hierarchy file is truncated")
+        magic, version, n, m_up, m_down, weight_typecode, labels_size, fingerprint = _BINARY_HEADER.unpack_from(mapping)
+        if magic != _BINARY_MAGIC:
+            raise ValueError("Not a hierarchy file")
+        if version != _BINARY_VERSION:
+            raise ValueError(f"Unsupported hierarchy file version {version}")
+        weight_typecode = weight_typecode.decode()
+        view = memoryview(mapping)
+        position = _BINARY_HEADER.size
+        sections = []
+        for count, typecode in ((n, 'q'),
+                                (n + 1, 'q'), (m_up, 'q'), (m_up, weight_typecode), (m_up, 'q'),
+                                (n + 1, 'q'), (m_down, 'q'), (m_down, weight_typecode), (m_down, 'q')):
+            end = position + 8 * count
+            if end > len(mapping):
+                raise ValueError("Hierarchy file is truncated")
+            sections.append(view[position:end].cast(typecode))
+            position = end
+        labels = None
+        if labels_size:
+            import json
+            labels = json.loads(bytes(view[position:position + labels_size]).decode('utf-8'))
+        rank = sections[0]
+        up = CSRGraph(*sections[1:4], labels)
+        down = CSRGraph(*sections[5:8], labels)
+        if labels is not None:
+            down._index = up._index = {label: i for i, label in enumerate(labels)}
+        fingerprint = fingerprint.hex() if any(fingerprint) else None
+        hierarchy = cls(rank, up, sections[4], down, sections[8], fingerprint)
+        hierarchy._mapping = mapping
+        return hierarchy
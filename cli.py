@@ -0,0 +1,178 @@
+import argparse
+import sys
+from itertools import islice
+
+import csr
+from kr2 import Graph
+
+# --- Пакетные запросы кратчайших путей без графического интерфейса ---
+#
+# python cli.py graph.txt --format edge_list < queries.txt > answers.txt
+#
+# Каждая строка запросов содержит пару "s t" (вершины нумеруются с 1, как в
+# файлах графа). Ответ на строку: "s t distance [путь]", для недостижимых
+# вершин расстояние равно inf. pygame и tkinter здесь не импортируются.
+
+BATCH_SIZE = 4096
+FORMATS = ('matrix', 'edge_list', 'adj_list', 'binary')
+ALGORITHMS = ('dijkstra', 'bidirectional', 'floyd', 'ch')
+
+
+def read_queries(stream):
+    for number, line in enumerate(stream, 1):
+        parts = line.split()
+        if not parts or parts[0].startswith('#'):
+            continue
+        if len(parts) != 2:
+            raise ValueError(f"line {number}: expected 'source target'")
+        yield int(parts[0]) - 1, int(parts[1]) - 1
+
+
+def _check(graph, node):
+    if not 0 <= node < graph.num_vertices:
+        raise ValueError(f"vertex {node + 1} is out of range 1..{graph.num_vertices}")
+
+
+# --- Решатели: получают пачку запросов, возвращают (расстояние, путь) ---
+
+def solve_dijkstra(graph, batch, with_paths):
+    # Одна полная Дейкстра на каждый различный исток пачки.
+    by_source = {}
+    for i, (s, t) in enumerate(batch):
+        by_source.setdefault(s, []).append(i)
+    answers = [None] * len(batch)
+    for s, indices in by_source.items():
+        distances, predecessors = csr.dijkstra(graph, s)
+        for i in indices:
+            t = batch[i][1]
+            path = csr._path_from_predecessors(predecessors, t) if with_paths and distances[t] != float('inf') else None
+            answers[i] = distances[t], path
+    return answers
+
+
+def solve_bidirectional(graph, batch, with_paths):
+    answers = []
+    for s, t in batch:
+        distance, path = csr.bidirectional_dijkstra(graph, s, t)
+        answers.append((distance, path if with_paths else None))
+    return answers
+
+
+class FloydSolver:
+    def __init__(self, graph):
+        import apsp
+        labels, dist, next_node = apsp.dense_matrices(graph)
+        apsp.solve_dense(dist, next_node, labels=labels)
+        self.result = apsp.AllPairs(labels, dist, next_node, graph.integral_weights)
+
+    def __call__(self, graph, batch, with_paths):
+        pairs = [(graph.label_of(s), graph.label_of(t)) for s, t in batch]
+        distances = [self.result.distance(s, t) for s, t in pairs]
+        if not with_paths:
+            return [(distance, None) for distance in distances]
+        paths = [[graph.id_of(node) for node in path] if path is not None else None
+                 for path in self.result.paths(pairs)]
+        return list(zip(distances, paths))
+
+
+class HierarchySolver:
+    # Иерархия читается из файла, а если его нет или он построен для
+    # другого графа - строится заново и сохраняется.
+    def __init__(self, graph, filepath=None):
+        import os
+        import ch
+        self.hierarchy = None
+        if filepath is not None and os.path.exists(filepath):
+            self.hierarchy = ch.ContractionHierarchy.open(filepath)
+            if not self.hierarchy.matches(graph):
+                self.hierarchy = None
+        if self.hierarchy is None:
+            self.hierarchy = ch.build(graph)
+            if filepath is not None:
+                self.hierarchy.save(filepath)
+
+    def __call__(self, graph, batch, with_paths):
+        answers = []
+        for s, t in batch:
+            distance, path = self.hierarchy.query_ids(s, t)
+            answers.append((distance, path if with_paths else None))
+        return answers
+
+
+def format_distance(distance):
+    if distance == float('inf'):
+        return 'inf'
+    return str(int(distance)) if distance == int(distance) else repr(distance)
+
+
+def run(graph, queries, output, algorithm='dijkstra', with_paths=False, hierarchy=None):
+    if algorithm == 'floyd':
+        solve = FloydSolver(graph)
+    elif algorithm == 'ch':
+        solve = HierarchySolver(graph, hierarchy)
+    elif algorithm == 'bidirectional':
+        solve = solve_bidirectional
+    else:
+        solve = solve_dijkstra
+    answered = 0
+    while True:
+        batch = list(islice(queries, BATCH_SIZE))
+        if not batch:
+            return answered
+        for s, t in batch:
+            _check(graph, s)
+            _check(graph, t)
+        lines = []
+        for (s, t), (distance, path) in zip(batch, solve(graph, batch, with_paths)):
+            line = f"{s + 1} {t + 1} {format_distance(distance)}"
+            if path is not None:
+                line += ' ' + ' '.join(str(node + 1) for node in path)
+            lines.append(line)
+        output.write('\n'.join(lines) + '\n')
+        answered += len(batch)
+
+
+def load(filepath, format_type=None):
+    if format_type is None:
+        format_type = 'binary' if filepath.endswith('.csrg') else 'edge_list'
+    if format_type == 'binary':
+        return csr.CSRGraph.open(filepath)
+    graph = Graph()
+    success, message = graph.load_from_file(filepath, format_type)
+    if not success:
+        raise ValueError(message)
+    return graph.to_csr()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch shortest path queries on a graph file.")
+    parser.add_argument('graph', help="graph file (matrix, edge list, adjacency list or .csrg)")
+    parser.add_argument('--format', choices=FORMATS, help="graph file format (default: by extension)")
+    parser.add_argument('--queries', default='-', help="file with 'source target' lines (default: stdin)")
+    parser.add_argument('--output', default='-', help="answers file (default: stdout)")
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='dijkstra')
+    parser.add_argument('--hierarchy', help="contraction hierarchy file for --algorithm ch (built if missing or stale)")
+    parser.add_argument('--paths', action='store_true', help="append the vertices of each path")
+    args = parser.parse_args(argv)
+
+    queries_file, output = sys.stdin, sys.stdout
+    try:
+        if args.queries != '-':
+            queries_file = open(args.queries)
+        if args.output != '-':
+            output = open(args.output, 'w', buffering=1 << 20)
+        graph = load(args.graph, args.format)
+        run(graph, read_queries(queries_file), output, args.algorithm, args.paths, args.hierarchy)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if queries_file is not sys.stdin:
+            queries_file.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+
+import pqueue
+
+# --- Компактный граф в формате CSR (смещения / цели / веса) ---
+
+_BINARY_MAGIC = b'CSRG'
+_BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct('<4sIQQc7xQ')
+
+
+class NegativeCycleError(ValueError):
+    pass
+
+
+def buffer_typecode(buffer):
+    typecode = getattr(buffer, 'typecode', None)
+    return typecode if typecode is not None else buffer.format
+
+
+def _weights_typecode(weights):
+    for w in weights:
+        if not isinstance(w, int):
+            return 'd'
+    return 'q'
+
+
+class CSRGraph:
+    def __init__(self, offsets, targets, weights, labels=None):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.num_vertices = len(offsets) - 1
+        self.labels = labels if labels is not None else range(self.num_vertices)
+        self._index = None
+        self._reverse = None
+        self._negative = None
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    @property
+    def integral_weights(self):
+        return buffer_typecode(self.weights) == 'q'
+
+    @property
+    def has_negative_weights(self):
+        if self._negative is None:
+            self._negative = len(self.weights) > 0 and min(self.weights) < 0
+        return self._negative
+
+    def __len__(self):
+        return self.num_vertices
+
+    def __contains__(self, label):
+        return self.id_of(label) is not None
+
+    def id_of(self, label):
+        if isinstance(self.labels, range):
+            if isinstance(label, int) and 0 <= label < self.num_vertices:
+                return label
+            return None
+        if self._index is None:
+            self._index = {lbl: i for i, lbl in enumerate(self.labels)}
+        return self._index.get(label)
+
+    def label_of(self, node_id):
+        return self.labels[node_id]
+
+    def neighbors(self, u):
+        targets, weights = self.targets, self.weights
+        for e in range(self.offsets[u], self.offsets[u + 1]):
+            yield targets[e], weights[e]
+
+    # --- Построение ---
+
+    @classmethod
+    def from_rows(cls, rows, labels=None):
+        offsets = array('q', [0])
+        targets = array('q')
+        all_weights = []
+        for row in rows:
+            for v, w in row:
+                targets.append(v)
+                all_weights.append(w)
+            offsets.append(len(targets))
+        weights = array(_weights_typecode(all_weights), all_weights)
+        return cls(offsets, targets, weights, labels)
+
+    @classmethod
+    def from_dict(cls, graph):
+        labels = list(graph)
+        index = {label: i for i, label in enumerate(labels)}
+        for neighbors in list(graph.values()):
+            for v in neighbors:
+                if v not in index:
+                    index[v] = len(labels)
+                    labels.append(v)
+        rows = []
+        for label in labels:
+            neighbors = graph.get(label, {})
+            rows.append(sorted((index[v], w) for v, w in neighbors.items()))
+        csr = cls.from_rows(rows, labels)
+        csr._index = index
+        return csr
+
+    @classmethod
+    def from_adj_list(cls, adj_list, num_vertices):
+        rows = [sorted(adj_list.get(u, {}).items()) for u in range(num_vertices)]
+        return cls.from_rows(rows)
+
+    # --- Обратные преобразования ---
+
+    def to_dict(self):
+        labels = self.labels
+        return {
+            labels[u]: {labels[v]: w for v, w in self.neighbors(u)}
+            for u in range(self.num_vertices)
+        }
+
+    def to_adj_list(self):
+        adj_list = {}
+        for u in range(self.num_vertices):
+            if self.offsets[u] != self.offsets[u + 1]:
+                adj_list[u] = dict(self.neighbors(u))
+        return adj_list
+
+    def reverse(self):
+        if self._reverse is None:
+            rows = [[] for _ in range(self.num_vertices)]
+            for u in range(self.num_vertices):
+                for v, w in self.neighbors(u):
+                    rows[v].append((u, w))
+            self._reverse = CSRGraph.from_rows(rows, self.labels)
+            self._reverse._index = self._index
+            self._reverse._reverse = self
+        return self._reverse
+
+    # --- Бинарный формат: заголовок + массивы CSR, открывается через mmap ---
+
+    def save(self, filepath):
+        labels = b''
+        if not isinstance(self.labels, range):
+            import json
+            labels = json.dumps(list(self.labels), ensure_ascii=False).encode('utf-8')
+        weight_typecode = buffer_typecode(self.weights)
+        header = _BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, self.num_vertices, self.num_edges,
+                                     weight_typecode.encode(), len(labels))
+        # Граф может быть отображён из того же файла, поэтому файл
+        # записывается рядом и подменяется целиком.
+        with open(filepath + '.tmp', 'wb') as f:
+            f.write(header)
+            for buffer in (self.offsets, self.targets, self.weights):
+                f.write(bytes(buffer))
+            f.write(labels)
+        os.replace(filepath + '.tmp', filepath)
+
+    @classmethod
+    def open(cls, filepath):
+        if sys.byteorder != 'little':
+            raise ValueError("Binary graph files are little-endian only")
+        with open(filepath, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapping) < _BINARY_HEADER.size:
+            raise ValueError("Binary graph file is truncated")
+        magic, version, n, m, weight_typecode, labels_size = _BINARY_HEADER.unpack_from(mapping)
+        if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+            raise ValueError("Not a binary graph file")
+        view = memoryview(mapping)
+        position = _BINARY_HEADER.size
+        sections = []
+        for count, typecode in ((n + 1, 'q'), (m, 'q'), (m, weight_typecode.decode())):
+            end = position + 8 * count
+            if end > len(mapping):
+                raise ValueError("Binary graph file is truncated")
+            sections.append(view[position:end].cast(typecode))
+            position = end
+        labels = None
+        if labels_size:
+            import json
+            labels = json.loads(bytes(view[position:position + labels_size]).decode('utf-8'))
+        graph = cls(*sections, labels)
+        graph._mapping = mapping
+        return graph
+
+    def as_numpy(self):
+        import numpy as np
+        return (np.frombuffer(self.offsets, dtype=np.int64),
+                np.frombuffer(self.targets, dtype=np.int64),
+                np.frombuffer(self.weights, dtype=np.int64 if self.integral_weights else np.float64))
+
+
+# --- Алгоритм Дейкстры на целочисленных идентификаторах ---
+
+def require_nonnegative(csr):
+    # Дейкстра на отрицательных весах молча даёт неверный ответ.
+    if csr.has_negative_weights:
+        raise ValueError("Dijkstra requires non-negative edge weights; use bellman_ford or apsp.johnson")
+
+
+def _dijkstra_indexed(csr, source, observer, priority_queue):
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = [float('infinity')] * csr.num_vertices
+    predecessors = [-1] * csr.num_vertices
+    distances[source] = 0
+    priority_queue.push(source, 0)
+    if observer is not None:
+        observer.on_start(range(csr.num_vertices))
+        changes = {source: 0}
+    while priority_queue:
+        current_distance, u = priority_queue.pop()
+        if observer is not None:
+            observer.on_settle(u, current_distance, changes)
+            changes = {}
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < distances[v]:
+                distances[v] = distance
+                predecessors[v] = u
+                priority_queue.push(v, distance)
+                if observer is not None:
+                    changes[v] = distance
+    if observer is not None:
+        observer.on_finish(distances)
+    return distances, predecessors
+
+
+def dijkstra(csr, source, observer=None, queue='heapq'):
+    require_nonnegative(csr)
+    if queue != 'heapq':
+        return _dijkstra_indexed(csr, source, observer, pqueue.make_queue(queue, csr.weights))
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = [float('infinity')] * csr.num_vertices
+    predecessors = [-1] * csr.num_vertices
+    distances[source] = 0
+    priority_queue = [(0, source)]
+    if observer is not None:
+        observer.on_start(range(csr.num_vertices))
+        changes = {source: 0}
+    while priority_queue:
+        current_distance, u = heapq.heappop(priority_queue)
+        if current_distance > distances[u]:
+            if observer is not None:
+                observer.on_stale(u, current_distance)
+            continue
+        if observer is not None:
+            observer.on_settle(u, current_distance, changes)
+            changes = {}
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < distances[v]:
+                distances[v] = distance
+                predecessors[v] = u
+                heapq.heappush(priority_queue, (distance, v))
+                if observer is not None:
+                    changes[v] = distance
+    if observer is not None:
+        observer.on_finish(distances)
+    return distances, predecessors
+
+
+def _path_from_predecessors(predecessors, target):
+    path = []
+    while target != -1:
+        path.append(target)
+        target = predecessors[target]
+    return path[::-1]
+
+
+def shortest_path(csr, source, target, observer=None):
+    require_nonnegative(csr)
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = {source: 0}
+    predecessors = {source: -1}
+    priority_queue = [(0, source)]
+    if observer is not None:
+        observer.on_start(range(csr.num_vertices))
+        changes = {source: 0}
+    while priority_queue:
+        current_distance, u = heapq.heappop(priority_queue)
+        if current_distance > distances[u]:
+            if observer is not None:
+                observer.on_stale(u, current_distance)
+            continue
+        if observer is not None:
+            observer.on_settle(u, current_distance, changes)
+            changes = {}
+        if u == target:
+            break
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < distances.get(v, float('infinity')):
+                distances[v] = distance
+                predecessors[v] = u
+                heapq.heappush(priority_queue, (distance, v))
+                if observer is not None:
+                    changes[v] = distance
+    if observer is not None:
+        observer.on_finish(distances)
+    if target not in predecessors:
+        return float('infinity'), None
+    return distances[target], _path_from_predecessors(predecessors, target)
+
+
+def bidirectional_dijkstra(csr, source, target):
+    require_nonnegative(csr)
+    if source == target:
+        return 0, [source]
+    graphs = (csr, csr.reverse())
+    distances = ({source: 0}, {target: 0})
+    predecessors = ({source: -1}, {target: -1})
+    queues = ([(0, source)], [(0, target)])
+    best, meeting = float('infinity'), -1
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        current_distance, u = heapq.heappop(queues[side])
+        dist, other = distances[side], distances[1 - side]
+        if current_distance > dist[u]:
+            continue
+        g = graphs[side]
+        offsets, targets, weights = g.offsets, g.targets, g.weights
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < dist.get(v, float('infinity')):
+                dist[v] = distance
+                predecessors[side][v] = u
+                heapq.heappush(queues[side], (distance, v))
+                if v in other and distance + other[v] < best:
+                    best, meeting = distance + other[v], v
+    if meeting == -1:
+        return float('infinity'), None
+    path = _path_from_predecessors(predecessors[0], meeting)
+    node = predecessors[1][meeting]
+    while node != -1:
+        path.append(node)
+        node = predecessors[1][node]
+    return best, path
+
+
+def astar(csr, source, target, heuristic, observer=None):
+    require_nonnegative(csr)
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = {source: 0}
+    predecessors = {source: -1}
+    priority_queue = [(heuristic(source), 0, source)]
+    if observer is not None:
+        observer.on_start(range(csr.num_vertices))
+        changes = {source: 0}
+    result = float('infinity'), None
+    while priority_queue:
+        _, current_distance, u = heapq.heappop(priority_queue)
+        if current_distance > distances[u]:
+            if observer is not None:
+                observer.on_stale(u, current_distance)
+            continue
+        if observer is not None:
+            observer.on_settle(u, current_distance, changes)
+            changes = {}
+        if u == target:
+            result = current_distance, _path_from_predecessors(predecessors, target)
+            break
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < distances.get(v, float('infinity')):
+                distances[v] = distance
+                predecessors[v] = u
+                heapq.heappush(priority_queue, (distance + heuristic(v), distance, v))
+                if observer is not None:
+                    changes[v] = distance
+    if observer is not None:
+        observer.on_finish(distances)
+    return result
+
+
+# --- Беллман-Форд с очередью (SPFA) для отрицательных весов ---
+
+def bellman_ford(csr, source=None):
+    # Без source поиск идёт от виртуальной вершины с рёбрами веса 0 во все
+    # вершины: так считаются потенциалы для алгоритма Джонсона.
+    n = csr.num_vertices
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = [float('infinity')] * n
+    predecessors = [-1] * n
+    # Число рёбер в текущем кратчайшем пути: путь из n и более рёбер
+    # повторяет вершину, значит, содержит отрицательный цикл.
+    lengths = [0] * n
+    if source is None:
+        distances = [0] * n
+        queue = deque(range(n))
+    else:
+        distances[source] = 0
+        queue = deque([source])
+    queued = [False] * n
+    for u in queue:
+        queued[u] = True
+    while queue:
+        u = queue.popleft()
+        queued[u] = False
+        current_distance = distances[u]
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            distance = current_distance + weights[e]
+            if distance < distances[v]:
+                distances[v] = distance
+                predecessors[v] = u
+                lengths[v] = lengths[u] + 1
+                if lengths[v] >= n:
+                    raise NegativeCycleError(f"Negative cycle through vertex {csr.label_of(v)}")
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+    return distances, predecessors
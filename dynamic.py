@@ -0,0 +1,217 @@
+import heapq
+
+# --- Поддержка кратчайших путей при изменении весов рёбер ---
+
+INF = float('infinity')
+
+
+def _copy_graph(graph):
+    copy = {node: dict(neighbors) for node, neighbors in graph.items()}
+    for neighbors in graph.values():
+        for neighbor in neighbors:
+            copy.setdefault(neighbor, {})
+    return copy
+
+
+def _reverse(graph):
+    reverse = {node: {} for node in graph}
+    for node, neighbors in graph.items():
+        for neighbor, weight in neighbors.items():
+            reverse[neighbor][node] = weight
+    return reverse
+
+
+def _single_source(graph, source):
+    distances = {source: 0}
+    predecessors = {source: None}
+    priority_queue = [(0, source)]
+    order = []
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if current_distance > distances[current_node]:
+            continue
+        order.append(current_node)
+        for neighbor, weight in graph[current_node].items():
+            distance = current_distance + weight
+            if distance < distances.get(neighbor, INF):
+                distances[neighbor] = distance
+                predecessors[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
+    return distances, predecessors, order
+
+
+class DynamicShortestPaths:
+    def __init__(self, graph, source, distances=None, predecessors=None):
+        self.graph = _copy_graph(graph)
+        self.reverse = _reverse(self.graph)
+        self.source = source
+        if distances is None or predecessors is None:
+            distances, predecessors, _ = _single_source(self.graph, source)
+        self.distances = {node: distances.get(node, INF) for node in self.graph}
+        self.predecessors = {node: predecessors.get(node) for node in self.graph}
+        self.children = {node: set() for node in self.graph}
+        for node, parent in self.predecessors.items():
+            if parent is not None:
+                self.children[parent].add(node)
+
+    def _add_node(self, node):
+        if node not in self.graph:
+            self.graph[node] = {}
+            self.reverse[node] = {}
+            self.distances[node] = INF
+            self.predecessors[node] = None
+            self.children[node] = set()
+
+    def _set_parent(self, node, parent):
+        old = self.predecessors[node]
+        if old is not None:
+            self.children[old].discard(node)
+        self.predecessors[node] = parent
+        if parent is not None:
+            self.children[parent].add(node)
+
+    def _propagate(self, priority_queue):
+        distances = self.distances
+        while priority_queue:
+            current_distance, current_node = heapq.heappop(priority_queue)
+            if current_distance > distances[current_node]:
+                continue
+            for neighbor, weight in self.graph[current_node].items():
+                distance = current_distance + weight
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    self._set_parent(neighbor, current_node)
+                    heapq.heappush(priority_queue, (distance, neighbor))
+
+    def _decrease(self, u, v, weight):
+        distance = self.distances[u] + weight
+        if distance < self.distances[v]:
+            self.distances[v] = distance
+            self._set_parent(v, u)
+            self._propagate([(distance, v)])
+
+    def _increase(self, v):
+        affected = []
+        stack = [v]
+        while stack:
+            node = stack.pop()
+            affected.append(node)
+            stack.extend(self.children[node])
+        affected_set = set(affected)
+        for node in affected:
+            self.distances[node] = INF
+            self._set_parent(node, None)
+
+        priority_queue = []
+        for node in affected:
+            best, parent = INF, None
+            for u, weight in self.reverse[node].items():
+                if u not in affected_set and self.distances[u] + weight < best:
+                    best, parent = self.distances[u] + weight, u
+            if parent is not None:
+                self.distances[node] = best
+                self._set_parent(node, parent)
+                heapq.heappush(priority_queue, (best, node))
+        self._propagate(priority_queue)
+        return affected
+
+    def set_edge(self, u, v, weight):
+        self._add_node(u)
+        self._add_node(v)
+        old = self.graph[u].get(v)
+        self.graph[u][v] = weight
+        self.reverse[v][u] = weight
+        if old is None or weight < old:
+            self._decrease(u, v, weight)
+        elif weight > old and self.predecessors[v] == u and v != self.source:
+            self._increase(v)
+
+    def remove_edge(self, u, v):
+        if v not in self.graph.get(u, {}):
+            return
+        del self.graph[u][v]
+        del self.reverse[v][u]
+        if self.predecessors[v] == u and v != self.source:
+            self._increase(v)
+
+
+class DynamicAllPairs:
+    def __init__(self, graph, dist=None, next_node=None):
+        self.graph = _copy_graph(graph)
+        self.reverse = _reverse(self.graph)
+        if dist is None or next_node is None:
+            dist, next_node = {}, {}
+            for node in self.graph:
+                dist[node], next_node[node] = self._solve_row(node)
+        self.dist = {u: dict(row) for u, row in dist.items()}
+        self.next_node = {u: dict(row) for u, row in next_node.items()}
+
+    def _solve_row(self, source):
+        distances, predecessors, order = _single_source(self.graph, source)
+        hops = {source: source}
+        for node in order[1:]:
+            parent = predecessors[node]
+            hops[node] = node if parent == source else hops[parent]
+        return ({node: distances.get(node, INF) for node in self.graph},
+                {node: hops.get(node) for node in self.graph})
+
+    def _add_node(self, node):
+        if node in self.graph:
+            return
+        self.graph[node] = {}
+        self.reverse[node] = {}
+        for u in self.dist:
+            self.dist[u][node] = INF
+            self.next_node[u][node] = None
+        self.dist[node] = {v: INF for v in self.graph}
+        self.next_node[node] = {v: None for v in self.graph}
+        self.dist[node][node] = 0
+        self.next_node[node][node] = node
+
+    def _to(self, i, u):
+        return 0 if i == u else self.dist[i][u]
+
+    def _decrease(self, u, v, weight):
+        from_v = [(j, 0 if j == v else d) for j, d in self.dist[v].items() if d != INF or j == v]
+        for i in self.graph:
+            to_u = self._to(i, u)
+            if to_u == INF:
+                continue
+            row, next_row = self.dist[i], self.next_node[i]
+            hop = v if i == u else next_row[u]
+            for j, from_v_to_j in from_v:
+                if i == j:
+                    continue
+                candidate = to_u + weight + from_v_to_j
+                if candidate < row[j]:
+                    row[j] = candidate
+                    next_row[j] = hop
+
+    def _increase(self, u, v, old_weight):
+        affected = []
+        for i in self.graph:
+            to_u, to_v = self._to(i, u), self._to(i, v)
+            if to_u != INF and to_u + old_weight - to_v <= 1e-9 * max(1, abs(to_v)):
+                affected.append(i)
+        for i in affected:
+            self.dist[i], self.next_node[i] = self._solve_row(i)
+        return affected
+
+    def set_edge(self, u, v, weight):
+        self._add_node(u)
+        self._add_node(v)
+        old = self.graph[u].get(v)
+        self.graph[u][v] = weight
+        self.reverse[v][u] = weight
+        if old is None or weight < old:
+            self._decrease(u, v, weight)
+        elif weight > old:
+            self._increase(u, v, old)
+
+    def remove_edge(self, u, v):
+        old = self.graph.get(u, {}).get(v)
+        if old is None:
+            return
+        del self.graph[u][v]
+        del self.reverse[v][u]
+        self._increase(u, v, old)
@@ -0,0 +1,37 @@
+import time
+
+from metrics import METRICS
+
+# --- Счётчик времени отрисовки кадра ---
+#
+# start()/stop() оборачивают отрисовку, текст обновляется не чаще раза в
+# interval секунд; кадры без изменений не рисуются и не учитываются.
+
+
+class FrameTimer:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.text = ""
+        self.rendered = 0
+        self.skipped = 0
+        self._samples = []
+        self._started = None
+        self._reported = time.perf_counter()
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def skip(self):
+        self.skipped += 1
+
+    def stop(self):
+        now = time.perf_counter()
+        self._samples.append(now - self._started)
+        if METRICS.enabled:
+            METRICS.frame(now - self._started)
+        self.rendered += 1
+        if now - self._reported >= self.interval:
+            average = sum(self._samples) / len(self._samples)
+            self.text = f"Кадр: {average * 1000:.2f} мс (отрисовано {self.rendered}, пропущено {self.skipped})"
+            self._samples.clear()
+            self._reported = now
@@ -0,0 +1,89 @@
+import random
+
+# --- Синтетические графы для замеров ---
+#
+# Все генераторы детерминированы по seed и возвращают граф в формате algo:
+# словарь {вершина: {сосед: вес}} с целыми вершинами 0..n-1, где у каждой
+# вершины есть (возможно пустой) словарь соседей.
+
+MAX_WEIGHT = 100
+
+
+def _empty(n):
+    return {node: {} for node in range(n)}
+
+
+def _add_both(graph, u, v, weight):
+    graph[u][v] = weight
+    graph[v][u] = weight
+
+
+def grid(rows, cols, seed=0, max_weight=MAX_WEIGHT, drop=0.1):
+    # Похож на дорожную сеть: решётка с двусторонними рёбрами, часть рёбер
+    # удалена, веса пропорциональны случайной "длине" участка.
+    rng = random.Random(seed)
+    graph = _empty(rows * cols)
+    for r in range(rows):
+        for c in range(cols):
+            node = r * cols + c
+            if c + 1 < cols and rng.random() >= drop:
+                _add_both(graph, node, node + 1, rng.randint(1, max_weight))
+            if r + 1 < rows and rng.random() >= drop:
+                _add_both(graph, node, node + cols, rng.randint(1, max_weight))
+    return graph
+
+
+def random_sparse(n, degree=4, seed=0, max_weight=MAX_WEIGHT):
+    rng = random.Random(seed)
+    graph = _empty(n)
+    for u in range(n):
+        for _ in range(degree):
+            v = rng.randrange(n)
+            if v != u:
+                graph[u][v] = rng.randint(1, max_weight)
+    return graph
+
+
+def scale_free(n, m=2, seed=0, max_weight=MAX_WEIGHT):
+    # Модель Барабаши-Альберт: новая вершина соединяется с m существующими
+    # с вероятностью, пропорциональной их степени.
+    rng = random.Random(seed)
+    graph = _empty(n)
+    endpoints = []
+    for u in range(min(m + 1, n)):
+        for v in range(u):
+            _add_both(graph, u, v, rng.randint(1, max_weight))
+            endpoints += (u, v)
+    for u in range(m + 1, n):
+        chosen = set()
+        while len(chosen) < m:
+            chosen.add(rng.choice(endpoints))
+        for v in chosen:
+            _add_both(graph, u, v, rng.randint(1, max_weight))
+            endpoints += (u, v)
+    return graph
+
+
+def dense(n, density=0.5, seed=0, max_weight=MAX_WEIGHT):
+    rng = random.Random(seed)
+    graph = _empty(n)
+    for u in range(n):
+        for v in range(n):
+            if u != v and rng.random() < density:
+                graph[u][v] = rng.randint(1, max_weight)
+    return graph
+
+
+# Размер задаётся числом вершин; для решётки берётся ближайший квадрат.
+GENERATORS = {
+    'grid': lambda n, seed: grid(int(n ** 0.5), int(n ** 0.5), seed),
+    'sparse': lambda n, seed: random_sparse(n, seed=seed),
+    'scale_free': lambda n, seed: scale_free(n, seed=seed),
+    'dense': lambda n, seed: dense(n, seed=seed),
+}
+
+
+def generate(kind, n, seed=0):
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown graph kind: {kind}")
+    return GENERATORS[kind](n, seed)
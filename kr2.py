@@ -1,16 +1,79 @@
-import pygame
 import math
-import tkinter as tk
-from tkinter import filedialog
+import gzip
+import io
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from csr import CSRGraph
+from metrics import METRICS, timed
+
+# --- Потоковое чтение файлов графа (в том числе сжатых gzip) ---
+
+READ_BUFFER_SIZE = 1 << 20
+# Прогресс сообщается по прочитанным байтам: в матрице на V вершин всего
+# V строк, но каждая длиной O(V).
+PROGRESS_EVERY_BYTES = 1 << 20
+
+def _open_text(raw):
+    if raw.peek(2)[:2] == b'\x1f\x8b':
+        raw = io.BufferedReader(gzip.GzipFile(fileobj=raw), READ_BUFFER_SIZE)
+    return io.TextIOWrapper(raw)
+
+def _iter_data_lines(text, raw, total_bytes, progress):
+    reported = 0
+    for line in text:
+        line = line.strip()
+        if line:
+            yield line
+        if progress is not None:
+            position = raw.tell()
+            if position - reported >= PROGRESS_EVERY_BYTES:
+                reported = position
+                progress(position, total_bytes)
+    if progress is not None:
+        progress(total_bytes, total_bytes)
 
 # --- Класс для представления графа и преобразований ---
 
 class Graph:
+    # Граф хранится либо в словаре adj_list, либо в CSRGraph (например,
+    # отображённом в память из бинарного файла). Во втором случае словарь
+    # строится только при первом обращении к adj_list, а размеры, строки
+    # представлений, to_csr и сохранение работают прямо по CSR.
     def __init__(self):
         self.adj_list = {}
         self.num_vertices = 0
+        self.version = 0
+        self._string_cache = {}
+
+    @property
+    def adj_list(self):
+        if self._adj_list is None:
+            # Словарь можно изменить на месте, поэтому после его
+            # построения CSR больше не используется.
+            self._adj_list = self._csr.to_adj_list()
+            self._csr = None
+        return self._adj_list
+
+    @adj_list.setter
+    def adj_list(self, adj_list):
+        self._adj_list = adj_list
+        self._csr = None
+
+    def mark_changed(self):
+        self.version += 1
+        self._string_cache.clear()
+
+    def assign(self, other):
+        self._adj_list, self._csr = other._adj_list, other._csr
+        self.num_vertices = other.num_vertices
+        self.mark_changed()
 
     def _update_num_vertices(self):
+        self.mark_changed()
         if not self.adj_list:
             self.num_vertices = 0
             return
@@ -22,7 +85,13 @@ class Graph:
     # --- Преобразования ИЗ других форматов ВО внутренний (список смежности) ---
 
     def from_matrix(self, matrix):
-        self.adj_list.clear()
+        # Если передан массив numpy, модуль уже загружен.
+        np = sys.modules.get('numpy')
+        if np is not None and isinstance(matrix, np.ndarray):
+            rows, cols = np.nonzero(matrix)
+            self.from_coo(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist(), 0)
+            return
+        self.adj_list = {}
         self.num_vertices = len(matrix)
         for i in range(self.num_vertices):
             for j in range(self.num_vertices):
@@ -33,7 +102,7 @@ class Graph:
         self._update_num_vertices()
 
     def from_edge_list(self, edge_list, num_vertices):
-        self.adj_list.clear()
+        self.adj_list = {}
         self.num_vertices = num_vertices
         for u, v, weight in edge_list:
             u_zero, v_zero = u - 1, v - 1
@@ -42,44 +111,223 @@ class Graph:
             self.adj_list[u_zero][v_zero] = weight
         self._update_num_vertices()
         
+    def from_coo(self, rows, cols, weights, num_vertices):
+        adj_list = self.adj_list = {}
+        for u, v, weight in zip(rows, cols, weights):
+            neighbors = adj_list.get(u)
+            if neighbors is None:
+                neighbors = adj_list[u] = {}
+            neighbors[v] = weight
+        self._update_num_vertices()
+        self.num_vertices = max(self.num_vertices, num_vertices)
+
+    @timed('convert.from_csr')
+    def from_csr(self, csr):
+        # Без копирования: граф ссылается на буферы csr. Вершины нумеруются
+        # с нуля, метки csr не используются.
+        if not isinstance(csr.labels, range):
+            csr = CSRGraph(csr.offsets, csr.targets, csr.weights)
+        self._adj_list, self._csr = None, csr
+        self.num_vertices = csr.num_vertices
+        self.mark_changed()
+
     # --- Преобразования ИЗ внутреннего формата В другие ---
     
+    def _rows(self):
+        # (u, пары (сосед, вес)) для вершин с исходящими рёбрами, по возрастанию u.
+        if self._adj_list is None:
+            csr = self._csr
+            for u in range(csr.num_vertices):
+                if csr.offsets[u] != csr.offsets[u + 1]:
+                    yield u, csr.neighbors(u)
+        else:
+            for u in sorted(self._adj_list):
+                yield u, self._adj_list[u].items()
+
+    def _row_items(self, u):
+        if self._adj_list is None:
+            return self._csr.neighbors(u)
+        return self._adj_list.get(u, {}).items()
+
+    def iter_edges(self):
+        for u, row in self._rows():
+            for v, weight in row:
+                yield u, v, weight
+
     def to_matrix(self):
         matrix = [[0] * self.num_vertices for _ in range(self.num_vertices)]
-        for u, neighbors in self.adj_list.items():
-            for v, weight in neighbors.items():
-                if u < self.num_vertices and v < self.num_vertices:
-                    matrix[u][v] = weight
+        for u, v, weight in self.iter_edges():
+            if u < self.num_vertices and v < self.num_vertices:
+                matrix[u][v] = weight
         return matrix
 
     def to_edge_list(self):
-        edge_list = []
-        for u, neighbors in self.adj_list.items():
-            for v, weight in neighbors.items():
-                edge_list.append((u + 1, v + 1, weight))
-        return sorted(edge_list)
+        return sorted((u + 1, v + 1, weight) for u, v, weight in self.iter_edges())
+
+    def to_coo(self):
+        rows, cols, weights = array('q'), array('q'), []
+        for u, row in self._rows():
+            for v, weight in sorted(row):
+                rows.append(u)
+                cols.append(v)
+                weights.append(weight)
+        return rows, cols, weights
+
+    @timed('convert.to_csr')
+    def to_csr(self):
+        if self._adj_list is None:
+            return self._csr
+        return CSRGraph.from_adj_list(self.adj_list, self.num_vertices)
+
+    # max_chars: строку можно оборвать, как только она длиннее max_chars
+    # символов, так что видимая строка стоит O(max_chars), а не O(V).
+
+    def _matrix_row(self, u, max_chars=None):
+        n = self.num_vertices
+        if max_chars is None:
+            row = ['0'] * n
+            for v, weight in self._row_items(u):
+                if v < n:
+                    row[v] = str(weight)
+            return " ".join(row)
+        # Соседи по возрастанию сливаются с номерами столбцов.
+        neighbors = iter(self._sorted_row(u))
+        neighbor = next(neighbors, None)
+        row, length = [], -1
+        for v in range(n):
+            while neighbor is not None and neighbor[0] < v:
+                neighbor = next(neighbors, None)
+            cell = str(neighbor[1]) if neighbor is not None and neighbor[0] == v else '0'
+            row.append(cell)
+            length += len(cell) + 1
+            if length > max_chars:
+                break
+        return " ".join(row)
+
+    def _adj_line(self, i, max_chars=None):
+        row = sorted(self._row_items(i)) if max_chars is None else self._sorted_row(i)
+        parts = [f"{len(row)}"]
+        length = len(parts[0])
+        for neighbor, weight in row:
+            parts.append(f"   {neighbor + 1} {weight}")
+            length += len(parts[-1])
+            if max_chars is not None and length > max_chars:
+                break
+        return "".join(parts)
+
+    def _sorted_row(self, u):
+        # Соседи u по возрастанию; хранятся до следующего изменения графа.
+        rows = self._string_cache.get('_sorted_rows')
+        if rows is None:
+            rows = self._string_cache['_sorted_rows'] = {}
+        row = rows.get(u)
+        if row is None:
+            row = rows[u] = sorted(self._row_items(u))
+        return row
+
+    def _edge_index(self):
+        index = self._string_cache.get('_edge_index')
+        if index is None and self._adj_list is None:
+            # У CSR смещения строк уже дают начало рёбер каждой вершины.
+            index = self._string_cache['_edge_index'] = (range(self.num_vertices), self._csr.offsets)
+        elif index is None:
+            sources = sorted(self.adj_list)
+            starts = array('q', [0])
+            for u in sources:
+                starts.append(starts[-1] + len(self.adj_list[u]))
+            index = self._string_cache['_edge_index'] = (sources, starts)
+        return index
+
+    def iter_matrix_rows(self):
+        for u in range(self.num_vertices):
+            yield self._matrix_row(u)
+
+    def iter_lines(self, format_type):
+        if format_type == 'matrix':
+            yield f"{self.num_vertices}"
+            yield from self.iter_matrix_rows()
+        elif format_type == 'edge_list':
+            yield f"{self.num_vertices} {self._edge_index()[1][-1]}"
+            for u, row in self._rows():
+                for v, weight in sorted(row):
+                    yield f"{u + 1} {v + 1} {weight}"
+        elif format_type == 'adj_list':
+            yield f"{self.num_vertices}"
+            for i in range(self.num_vertices):
+                yield self._adj_line(i)
+
+    # --- Построчный доступ к представлениям (для прокручиваемого просмотра) ---
+
+    def line_count(self, format_type):
+        if self.num_vertices == 0:
+            return 1
+        if format_type in ('matrix', 'adj_list'):
+            return self.num_vertices + 1
+        if format_type == 'edge_list':
+            return self._edge_index()[1][-1] + 1
+        return 0
+
+    def get_line(self, format_type, index, max_chars=None):
+        if self.num_vertices == 0:
+            return "Граф пуст."
+        if format_type == 'edge_list':
+            sources, starts = self._edge_index()
+            if index == 0:
+                return f"{self.num_vertices} {starts[-1]}"
+            position = bisect_right(starts, index - 1) - 1
+            u = sources[position]
+            v, weight = self._sorted_row(u)[index - 1 - starts[position]]
+            return f"{u + 1} {v + 1} {weight}"
+        if index == 0:
+            return f"{self.num_vertices}"
+        if format_type == 'matrix':
+            return self._matrix_row(index - 1, max_chars)
+        return self._adj_line(index - 1, max_chars)
         
     # --- Методы для работы с файлами и строковыми представлениями ---
     
-    def load_from_file(self, filepath, format_type):
+    @timed('parse')
+    def load_from_file(self, filepath, format_type, progress=None):
         try:
-            with open(filepath, 'r') as f:
-                lines = [line.strip() for line in f if line.strip()]
+            if format_type == 'binary':
+                self.from_csr(CSRGraph.open(filepath))
+                return True, f"Граф успешно загружен из {filepath.split('/')[-1]}"
+            with open(filepath, 'rb', buffering=READ_BUFFER_SIZE) as raw:
+                total_bytes = os.fstat(raw.fileno()).st_size
+                lines = _iter_data_lines(_open_text(raw), raw, total_bytes, progress)
+                self.adj_list = {}
                 if format_type == 'matrix':
-                    num_v = int(lines[0])
-                    matrix = [list(map(int, line.split())) for line in lines[1:]]
-                    if len(matrix) != num_v: raise ValueError("Matrix dimensions mismatch")
-                    self.from_matrix(matrix)
+                    num_v = int(next(lines))
+                    rows = 0
+                    for i, line in enumerate(lines):
+                        if i >= num_v: raise ValueError("Matrix dimensions mismatch")
+                        row = line.split()
+                        if len(row) < num_v: raise ValueError("Matrix dimensions mismatch")
+                        neighbors = {}
+                        for j in range(num_v):
+                            weight = int(row[j])
+                            if weight != 0:
+                                neighbors[j] = weight
+                        if neighbors:
+                            self.adj_list[i] = neighbors
+                        rows += 1
+                    if rows != num_v: raise ValueError("Matrix dimensions mismatch")
                 elif format_type == 'edge_list':
-                    num_v, num_e = map(int, lines[0].split())
-                    edges = [tuple(map(int, line.split())) for line in lines[1:]]
-                    if len(edges) != num_e: raise ValueError("Edge count mismatch")
-                    self.from_edge_list(edges, num_v)
+                    num_v, num_e = map(int, next(lines).split())
+                    edges = 0
+                    adj_list = self.adj_list
+                    for line in lines:
+                        u, v, weight = map(int, line.split())
+                        neighbors = adj_list.get(u - 1)
+                        if neighbors is None:
+                            neighbors = adj_list[u - 1] = {}
+                        neighbors[v - 1] = weight
+                        edges += 1
+                    if edges != num_e: raise ValueError("Edge count mismatch")
                 elif format_type == 'adj_list':
-                    self.adj_list.clear()
-                    num_v = int(lines[0])
+                    num_v = int(next(lines))
                     self.num_vertices = num_v
-                    for i, line in enumerate(lines[1:]):
+                    for i, line in enumerate(lines):
                         parts = list(map(int, line.split()))
                         num_neighbors = parts[0]
                         if num_neighbors > 0:
@@ -87,54 +335,59 @@ class Graph:
                             for j in range(num_neighbors):
                                 neighbor, weight = parts[1 + 2*j], parts[2 + 2*j]
                                 self.adj_list[i][neighbor - 1] = weight
-                    self._update_num_vertices()
+                self._update_num_vertices()
             return True, f"Граф успешно загружен из {filepath.split('/')[-1]}"
         except Exception as e:
-            self.adj_list.clear()
+            self.adj_list = {}
             self.num_vertices = 0
+            self.mark_changed()
             return False, f"Ошибка загрузки файла: {e}"
 
+    @timed('format')
     def get_string_representation(self, format_type):
         if self.num_vertices == 0:
             return "Граф пуст."
-        if format_type == 'matrix':
-            matrix = self.to_matrix()
-            header = f"{self.num_vertices}\n"
-            return header + "\n".join(" ".join(map(str, row)) for row in matrix)
-        elif format_type == 'edge_list':
-            edges = self.to_edge_list()
-            header = f"{self.num_vertices} {len(edges)}\n"
-            return header + "\n".join(f"{u} {v} {w}" for u, v, w in edges)
-        elif format_type == 'adj_list':
-            header = f"{self.num_vertices}\n"
-            lines = []
-            for i in range(self.num_vertices):
-                if i in self.adj_list:
-                    neighbors = self.adj_list[i]
-                    line = f"{len(neighbors)}"
-                    for neighbor, weight in sorted(neighbors.items()):
-                        line += f"   {neighbor + 1} {weight}"
-                    lines.append(line)
-                else:
-                    lines.append("0")
-            return header + "\n".join(lines)
-        return ""
+        text = self._string_cache.get(format_type)
+        if text is None:
+            text = self._string_cache[format_type] = "\n".join(self.iter_lines(format_type))
+        return text
 
     def save_to_file(self, filepath, format_type):
         try:
+            if format_type == 'binary':
+                self.to_csr().save(filepath)
+                return True, f"Граф успешно сохранен в {filepath.split('/')[-1]}"
             with open(filepath, 'w') as f:
-                f.write(self.get_string_representation(format_type))
+                if self.num_vertices == 0:
+                    f.write(self.get_string_representation(format_type))
+                else:
+                    lines = self.iter_lines(format_type)
+                    for line in lines:
+                        f.write(line)
+                        break
+                    for line in lines:
+                        f.write("\n")
+                        f.write(line)
             return True, f"Граф успешно сохранен в {filepath.split('/')[-1]}"
         except Exception as e:
             return False, f"Ошибка сохранения файла: {e}"
 
 
 # --- Настройки и компоненты Pygame ---
+#
+# pygame и tkinter импортируются только при запуске окна, чтобы Graph
+# можно было использовать без дисплея (например, из cli.py).
 
-pygame.init()
 SCREEN_WIDTH, SCREEN_HEIGHT = 1200, 700
-FONT = pygame.font.Font(None, 24)
-FONT_BOLD = pygame.font.Font(None, 28)
+FONT = None
+FONT_BOLD = None
+
+def init_ui():
+    global FONT, FONT_BOLD
+    import pygame
+    pygame.init()
+    FONT = pygame.font.Font(None, 24)
+    FONT_BOLD = pygame.font.Font(None, 28)
 
 WHITE = (255, 255, 255); BLACK = (0, 0, 0); GRAY = (200, 200, 200)
 BLUE = (0, 100, 255); RED = (255, 50, 50); PURPLE = (128, 0, 128)
@@ -142,12 +395,14 @@ LIGHT_GRAY = (220, 220, 220); DARK_GRAY = (100, 100, 100)
 
 class Button:
     def __init__(self, rect, text, color=LIGHT_GRAY, text_color=BLACK):
+        import pygame
         self.rect = pygame.Rect(rect)
         self.text = text
         self.color = color
         self.text_color = text_color
 
     def draw(self, screen):
+        import pygame
         pygame.draw.rect(screen, self.color, self.rect)
         pygame.draw.rect(screen, DARK_GRAY, self.rect, 2)
         text_surf = FONT.render(self.text, True, self.text_color)
@@ -157,37 +412,143 @@ class Button:
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
-def draw_text_area(screen, text, rect, title):
-    pygame.draw.rect(screen, WHITE, rect)
-    pygame.draw.rect(screen, DARK_GRAY, rect, 2)
-    
-    title_surf = FONT_BOLD.render(title, True, BLACK)
-    screen.blit(title_surf, (rect.x + 10, rect.y + 10))
-
-    lines = text.split('\n')
-    for i, line in enumerate(lines):
-        line_surf = FONT.render(line, True, BLACK)
-        screen.blit(line_surf, (rect.x + 15, rect.y + 45 + i * 25))
-
-def draw_visual_graph(screen, graph, area_rect):
-    if graph.num_vertices == 0:
-        return
-    
+class TextView:
+    def __init__(self, rect, line_height=25, top_margin=45, max_chars=200, cache_size=256):
+        import pygame
+        self.rect = pygame.Rect(rect)
+        self.line_height = line_height
+        self.top_margin = top_margin
+        self.max_chars = max_chars
+        self.cache_size = cache_size
+        self.scroll = 0
+        self._content = None
+        self._title = None
+        self._title_surf = None
+        self._line_surfs = OrderedDict()
+
+    @property
+    def visible_lines(self):
+        return max(1, (self.rect.height - self.top_margin - 10) // self.line_height)
+
+    def scroll_by(self, delta, total_lines):
+        max_scroll = max(0, total_lines - self.visible_lines)
+        self.scroll = min(max(0, self.scroll + delta), max_scroll)
+
+    def _line_surface(self, graph, format_type, index):
+        surf = self._line_surfs.get(index)
+        if surf is None:
+            line = graph.get_line(format_type, index, self.max_chars)
+            if len(line) > self.max_chars:
+                line = line[:self.max_chars] + " ..."
+            surf = self._line_surfs[index] = FONT.render(line, True, BLACK)
+            if len(self._line_surfs) > self.cache_size:
+                self._line_surfs.popitem(last=False)
+        else:
+            self._line_surfs.move_to_end(index)
+        return surf
+
+    @timed('render.text')
+    def draw(self, screen, graph, format_type, title):
+        import pygame
+        rect = self.rect
+        content = (graph.version, format_type)
+        if self._content != content:
+            self._content = content
+            self._line_surfs.clear()
+            self.scroll = 0
+        if self._title != title:
+            self._title = title
+            self._title_surf = FONT_BOLD.render(title, True, BLACK)
+
+        pygame.draw.rect(screen, WHITE, rect)
+        pygame.draw.rect(screen, DARK_GRAY, rect, 2)
+        screen.blit(self._title_surf, (rect.x + 10, rect.y + 10))
+
+        total = graph.line_count(format_type)
+        self.scroll_by(0, total)
+        first = self.scroll
+        last = min(total, first + self.visible_lines)
+        previous_clip = screen.get_clip()
+        screen.set_clip(rect.inflate(-4, -4))
+        for i in range(first, last):
+            surf = self._line_surface(graph, format_type, i)
+            screen.blit(surf, (rect.x + 15, rect.y + self.top_margin + (i - first) * self.line_height))
+        screen.set_clip(previous_clip)
+
+        if total > self.visible_lines:
+            track = pygame.Rect(rect.right - 10, rect.y + self.top_margin, 6, rect.height - self.top_margin - 10)
+            thumb_height = max(20, track.height * self.visible_lines // total)
+            thumb_y = track.y + (track.height - thumb_height) * first // max(1, total - self.visible_lines)
+            pygame.draw.rect(screen, LIGHT_GRAY, track)
+            pygame.draw.rect(screen, DARK_GRAY, (track.x, thumb_y, track.width, thumb_height))
+
+class GraphView:
+    # Рисунок графа меняется только вместе с самим графом, поэтому он
+    # хранится во внеэкранной поверхности и между изменениями просто
+    # копируется на экран. Раскладка считается в фоне; пока она не готова,
+    # вершины стоят по кругу.
+    def __init__(self, rect, reserved_right=0):
+        import pygame
+        self.rect = pygame.Rect(rect)
+        self.reserved_right = reserved_right
+        try:
+            import layout
+        except ImportError:
+            layout = None
+        self.layout = layout
+        self.layouts = layout.LayoutCache() if layout is not None else None
+        self._surface = None
+        self._key = None
+
+    def _coords(self, graph):
+        if self.layouts is None or graph.num_vertices == 0:
+            return None
+        return self.layouts.get(graph.version, graph.to_csr)
+
+    def key(self, graph):
+        return graph.version, self._coords(graph) is not None
+
+    @timed('render.graph')
+    def draw(self, screen, graph):
+        import pygame
+        coords = self._coords(graph)
+        key = (graph.version, coords is not None)
+        if self._key != key or self._surface is None:
+            self._surface = pygame.Surface(self.rect.size)
+            self._surface.fill(WHITE)
+            area_rect = self._surface.get_rect()
+            positions = None
+            if coords is not None:
+                # Справа поверх области графа лежат кнопки.
+                content_rect = area_rect.inflate(-self.reserved_right, 0).move(-self.reserved_right // 2, 0)
+                positions = dict(enumerate(self.layout.fit_to_rect(coords, content_rect)))
+            draw_visual_graph(self._surface, graph, area_rect, positions)
+            self._key = key
+        return screen.blit(self._surface, self.rect)
+
+def circle_positions(num_vertices, area_rect):
     center_x, center_y = area_rect.center
     radius = min(area_rect.width, area_rect.height) // 2 - 50
     positions = {}
-    angle_step = 2 * math.pi / graph.num_vertices
-    for i in range(graph.num_vertices):
+    angle_step = 2 * math.pi / num_vertices
+    for i in range(num_vertices):
         angle = i * angle_step - math.pi / 2
         x = center_x + radius * math.cos(angle)
         y = center_y + radius * math.sin(angle)
         positions[i] = (int(x), int(y))
+    return positions
+
+def draw_visual_graph(screen, graph, area_rect, positions=None):
+    import pygame
+    if graph.num_vertices == 0:
+        return
+    if positions is None:
+        positions = circle_positions(graph.num_vertices, area_rect)
 
-    for u, neighbors in graph.adj_list.items():
-        for v, weight in neighbors.items():
-            start_pos, end_pos = positions.get(u), positions.get(v)
-            if start_pos and end_pos:
-                draw_arrow(screen, DARK_GRAY, start_pos, end_pos, str(weight))
+    for u, v, weight in graph.iter_edges():
+        start_pos, end_pos = positions.get(u), positions.get(v)
+        if start_pos and end_pos:
+            draw_arrow(screen, DARK_GRAY, start_pos, end_pos, str(weight))
 
     for i in range(graph.num_vertices):
         pos = positions.get(i)
@@ -198,6 +559,7 @@ def draw_visual_graph(screen, graph, area_rect):
             screen.blit(text_surf, text_surf.get_rect(center=pos))
 
 def draw_arrow(screen, color, start, end, text, width=2):
+    import pygame
     node_radius = 20
     dx, dy = end[0] - start[0], end[1] - start[1]
     length = math.hypot(dx, dy)
@@ -221,7 +583,23 @@ def draw_arrow(screen, color, start, end, text, width=2):
 
 # --- Основной цикл приложения ---
 
+# --- Загрузка файлов в фоновом потоке ---
+
+def load_graph(filepath, format_type, observer=None):
+    # Файл читается в отдельный граф, который подменяет текущий только
+    # после завершения загрузки.
+    loaded = Graph()
+    progress = observer.on_progress if observer is not None else None
+    success, message = loaded.load_from_file(filepath, format_type, progress)
+    return loaded, success, message
+
 def main():
+    import pygame
+    import tkinter as tk
+    from tkinter import filedialog
+    from frame_timer import FrameTimer
+    from worker import ComputeWorker, Job
+    init_ui()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Графический Конвертер Представлений Графа")
     clock = pygame.time.Clock()
@@ -231,7 +609,13 @@ def main():
     status_message = "Загрузите граф из файла или преобразуйте существующий."
 
     text_area_rect = pygame.Rect(20, 20, 360, 660)
+    text_view = TextView(text_area_rect)
     graph_area_rect = pygame.Rect(400, 20, 780, 660)
+    graph_view = GraphView(graph_area_rect, reserved_right=140)
+    status_rect = pygame.Rect(400, SCREEN_HEIGHT - 30, SCREEN_WIDTH - 400, 30)
+    frame_timer = FrameTimer()
+    drawn = {'graph': None, 'text': None}
+    full_redraw = True
 
     buttons = {
         "load_matrix": Button((1060, 30, 120, 35), "Загрузить МС"),
@@ -245,35 +629,43 @@ def main():
         "conv_matrix": Button((1060, 340, 120, 35), "В МС"),
         "conv_edges":  Button((1060, 385, 120, 35), "В СР"),
         "conv_adj":    Button((1060, 430, 120, 35), "В СС"),
+
+        "load_bin":    Button((1060, 495, 120, 35), "Загрузить БФ"),
+        "save_bin":    Button((1060, 540, 120, 35), "Сохранить БФ"),
     }
     
     root = tk.Tk()
     root.withdraw()
+    worker = ComputeWorker()
 
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                full_redraw = True
+            if event.type == pygame.MOUSEWHEEL and text_area_rect.collidepoint(pygame.mouse.get_pos()):
+                text_view.scroll_by(-3 * event.y, graph.line_count(current_format))
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                page = text_view.visible_lines if event.key == pygame.K_PAGEDOWN else -text_view.visible_lines
+                text_view.scroll_by(page, graph.line_count(current_format))
             if event.type == pygame.MOUSEBUTTONDOWN:
                 pos = event.pos
                 if buttons["load_matrix"].is_clicked(pos):
-                    filepath = filedialog.askopenfilename(title="Выберите файл матрицы смежности", filetypes=[("Text files", "*.txt")])
+                    filepath = filedialog.askopenfilename(title="Выберите файл матрицы смежности", filetypes=[("Text files", "*.txt"), ("Gzip files", "*.gz")])
                     if filepath:
-                        success, status_message = graph.load_from_file(filepath, 'matrix')
-                        current_format = 'matrix' if success else current_format
+                        worker.submit(load_graph, filepath, 'matrix', group='load', tag='matrix')
                 
                 elif buttons["load_edges"].is_clicked(pos):
-                    filepath = filedialog.askopenfilename(title="Выберите файл списка ребер", filetypes=[("Text files", "*.txt")])
+                    filepath = filedialog.askopenfilename(title="Выберите файл списка ребер", filetypes=[("Text files", "*.txt"), ("Gzip files", "*.gz")])
                     if filepath:
-                        success, status_message = graph.load_from_file(filepath, 'edge_list')
-                        current_format = 'edge_list' if success else current_format
+                        worker.submit(load_graph, filepath, 'edge_list', group='load', tag='edge_list')
 
                 elif buttons["load_adj"].is_clicked(pos):
-                    filepath = filedialog.askopenfilename(title="Выберите файл списка смежности", filetypes=[("Text files", "*.txt")])
+                    filepath = filedialog.askopenfilename(title="Выберите файл списка смежности", filetypes=[("Text files", "*.txt"), ("Gzip files", "*.gz")])
                     if filepath:
-                        success, status_message = graph.load_from_file(filepath, 'adj_list')
-                        current_format = 'adj_list' if success else current_format
+                        worker.submit(load_graph, filepath, 'adj_list', group='load', tag='adj_list')
 
                 elif buttons["save_matrix"].is_clicked(pos) and graph.num_vertices > 0:
                     filepath = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")], title="Сохранить как матрицу смежности")
@@ -290,6 +682,16 @@ def main():
                     if filepath:
                         _, status_message = graph.save_to_file(filepath, 'adj_list')
 
+                elif buttons["load_bin"].is_clicked(pos):
+                    filepath = filedialog.askopenfilename(title="Выберите бинарный файл графа", filetypes=[("Binary graph files", "*.csrg")])
+                    if filepath:
+                        worker.submit(load_graph, filepath, 'binary', group='load', tag=None)
+
+                elif buttons["save_bin"].is_clicked(pos) and graph.num_vertices > 0:
+                    filepath = filedialog.asksaveasfilename(defaultextension=".csrg", filetypes=[("Binary graph files", "*.csrg")], title="Сохранить в бинарном формате")
+                    if filepath:
+                        _, status_message = graph.save_to_file(filepath, 'binary')
+
                 elif buttons["conv_matrix"].is_clicked(pos):
                     current_format = 'matrix'
                     status_message = "Граф преобразован в матрицу смежности."
@@ -300,28 +702,64 @@ def main():
                     current_format = 'adj_list'
                     status_message = "Граф преобразован в список смежности."
 
-        screen.fill(GRAY)
-        
-        pygame.draw.rect(screen, WHITE, graph_area_rect)
-        draw_visual_graph(screen, graph, graph_area_rect)
-
-        format_titles = {
-            'matrix': 'Матрица смежности',
-            'edge_list': 'Список ребер',
-            'adj_list': 'Список смежности'
-        }
-        text_to_display = graph.get_string_representation(current_format)
-        draw_text_area(screen, text_to_display, text_area_rect, format_titles[current_format])
-        
-        for btn in buttons.values():
-            btn.draw(screen)
-
-        status_surf = FONT.render(status_message, True, BLACK)
-        screen.blit(status_surf, (410, SCREEN_HEIGHT - 30))
-
-        pygame.display.flip()
+        for job in worker.poll():
+            if job.state == Job.FAILED:
+                status_message = f"Ошибка загрузки файла: {job.error}"
+                continue
+            loaded, success, status_message = job.result
+            graph.assign(loaded)
+            if success and job.tag is not None:
+                current_format = job.tag
+
+        loading = worker.current('load')
+        if loading is not None:
+            name = os.path.basename(loading.args[0])
+            status_message = f"Загрузка {name}: {loading.progress:.0%}"
+
+        # Перерисовываются только области, состояние которых изменилось.
+        frame_timer.start()
+        dirty_rects = []
+        if full_redraw:
+            screen.fill(GRAY)
+            dirty_rects.append(screen.get_rect())
+
+        if full_redraw or drawn['text'] != (graph.version, current_format, text_view.scroll):
+            format_titles = {
+                'matrix': 'Матрица смежности',
+                'edge_list': 'Список ребер',
+                'adj_list': 'Список смежности'
+            }
+            text_view.draw(screen, graph, current_format, format_titles[current_format])
+            dirty_rects.append(text_view.rect)
+            drawn['text'] = (graph.version, current_format, text_view.scroll)
+
+        # Кнопки и строка состояния лежат поверх области графа, поэтому
+        # они перерисовываются вместе с ней.
+        overlay_lines = METRICS.overlay_lines() if METRICS.enabled else ()
+        graph_state = (graph_view.key(graph), status_message, frame_timer.text, overlay_lines)
+        if full_redraw or drawn['graph'] != graph_state:
+            screen.fill(GRAY, status_rect)
+            dirty_rects.append(graph_view.draw(screen, graph))
+            for btn in buttons.values():
+                btn.draw(screen)
+            status_surf = FONT.render(status_message, True, BLACK)
+            screen.blit(status_surf, (410, SCREEN_HEIGHT - 30))
+            timer_surf = FONT.render(frame_timer.text, True, DARK_GRAY)
+            screen.blit(timer_surf, timer_surf.get_rect(bottomright=(SCREEN_WIDTH - 10, SCREEN_HEIGHT - 2)))
+            for i, line in enumerate(overlay_lines):
+                screen.blit(FONT.render(line, True, DARK_GRAY), (graph_area_rect.x + 10, graph_area_rect.y + 10 + 22 * i))
+            dirty_rects.append(status_rect)
+            drawn['graph'] = graph_state
+
+        full_redraw = False
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            frame_timer.stop()
+        else:
+            frame_timer.skip()
         clock.tick(60)
 
+    worker.shutdown()
     pygame.quit()
 
 if __name__ == '__main__':
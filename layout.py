@@ -0,0 +1,297 @@
+import math
+import threading
+
+import numpy as np
+
+from csr import CSRGraph
+
+# --- Автоматическая раскладка вершин графа ---
+#
+# Координаты считаются в единичном квадрате в порядке идентификаторов
+# CSRGraph и переводятся в экранные функцией fit_to_rect.
+
+EXACT_LIMIT = 500
+COARSEST_SIZE = 60
+CHUNK_SIZE = 2048
+
+
+def _as_csr(graph):
+    return graph if isinstance(graph, CSRGraph) else CSRGraph.from_dict(graph)
+
+
+def _undirected_edges(graph):
+    offsets, targets, _ = graph.as_numpy()
+    sources = np.repeat(np.arange(graph.num_vertices), np.diff(offsets))
+    keep = sources != targets
+    u, v = np.minimum(sources, targets)[keep], np.maximum(sources, targets)[keep]
+    if len(u) == 0:
+        return u, v
+    pairs = np.unique(u * graph.num_vertices + v)
+    return pairs // graph.num_vertices, pairs % graph.num_vertices
+
+
+def circle(n):
+    angles = np.arange(n) * (2 * math.pi / max(n, 1)) - math.pi / 2
+    return np.column_stack((0.5 + 0.5 * np.cos(angles), 0.5 + 0.5 * np.sin(angles)))
+
+
+def _repulsion_exact(pos, k2):
+    n = len(pos)
+    force = np.zeros_like(pos)
+    for start in range(0, n, CHUNK_SIZE):
+        block = pos[start:start + CHUNK_SIZE]
+        delta = block[:, None, :] - pos[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+        np.maximum(dist2, 1e-12, out=dist2)
+        force[start:start + CHUNK_SIZE] = np.einsum('ijk,ij->ik', delta, k2 / dist2)
+    return force
+
+
+def _cell_masses(cell, pos, cells):
+    counts = np.bincount(cell, minlength=cells)
+    sums = np.column_stack((np.bincount(cell, pos[:, 0], cells), np.bincount(cell, pos[:, 1], cells)))
+    return counts, sums / np.maximum(counts, 1)[:, None]
+
+
+def _repulsion_grid(pos, k2):
+    # Двухуровневое приближение в духе Барнса-Хата на равномерной сетке:
+    # вершины из соседних (3x3) ячеек считаются точно, остальные ячейки
+    # внутри соседних крупных ячеек (4x4 мелких) - по центрам масс мелких
+    # ячеек, всё дальше - по центрам масс крупных.
+    n = len(pos)
+    side = max(4, int(math.sqrt(n / 4)))
+    coarse_side = (side + 3) // 4
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    cell_xy = np.minimum(((pos - low) / span * side).astype(np.int64), side - 1)
+    coarse_xy = cell_xy // 4
+    cell = cell_xy[:, 0] * side + cell_xy[:, 1]
+    coarse = coarse_xy[:, 0] * coarse_side + coarse_xy[:, 1]
+    counts, centers = _cell_masses(cell, pos, side * side)
+    coarse_counts, coarse_centers = _cell_masses(coarse, pos, coarse_side * coarse_side)
+    force = np.zeros_like(pos)
+
+    # Ближняя зона: все пары вершин из соседних ячеек.
+    order = np.argsort(cell, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    nx = cell_xy[:, 0, None] + offsets[:, 0]
+    ny = cell_xy[:, 1, None] + offsets[:, 1]
+    inside = (nx >= 0) & (nx < side) & (ny >= 0) & (ny < side)
+    nodes = np.broadcast_to(np.arange(n)[:, None], nx.shape)[inside]
+    neighbor = (nx * side + ny)[inside]
+    sizes = counts[neighbor]
+    total = int(sizes.sum())
+    first = np.repeat(starts[neighbor] - (np.cumsum(sizes) - sizes), sizes)
+    i = np.repeat(nodes, sizes)
+    j = order[np.arange(total) + first]
+    keep = i != j
+    i, j = i[keep], j[keep]
+    dx = pos[i, 0] - pos[j, 0]
+    dy = pos[i, 1] - pos[j, 1]
+    weight = k2 / np.maximum(dx * dx + dy * dy, 1e-12)
+    force[:, 0] += np.bincount(i, dx * weight, n)
+    force[:, 1] += np.bincount(i, dy * weight, n)
+
+    # Средняя зона: мелкие ячейки внутри соседних крупных, кроме ближних.
+    # Набор таких ячеек общий для всех вершин одной мелкой ячейки.
+    occupied = np.nonzero(counts)[0]
+    occupied_x, occupied_y = np.divmod(occupied, side)
+    window = np.arange(12)
+    fx = 4 * (occupied_x // 4 - 1)[:, None, None] + window[None, :, None]
+    fy = 4 * (occupied_y // 4 - 1)[:, None, None] + window[None, None, :]
+    fx, fy = np.broadcast_arrays(fx, fy)
+    mid = ((fx >= 0) & (fx < side) & (fy >= 0) & (fy < side)
+           & ((np.abs(fx - occupied_x[:, None, None]) > 1) | (np.abs(fy - occupied_y[:, None, None]) > 1)))
+    sources = np.broadcast_to(occupied[:, None, None], fx.shape)[mid]
+    target = (fx * side + fy)[mid]
+    keep = counts[target] > 0
+    sources, target = sources[keep], target[keep]
+    # Пары (ячейка, цель) раскрываются в пары (вершина, цель).
+    pair_starts = np.searchsorted(sources, occupied)
+    pair_counts = np.diff(np.append(pair_starts, len(sources)))
+    per_node = pair_counts[np.searchsorted(occupied, cell)]
+    nodes = np.repeat(np.arange(n), per_node)
+    first = np.repeat(pair_starts[np.searchsorted(occupied, cell)] - (np.cumsum(per_node) - per_node), per_node)
+    target = target[np.arange(len(nodes)) + first]
+    dx = pos[nodes, 0] - centers[target, 0]
+    dy = pos[nodes, 1] - centers[target, 1]
+    weight = counts[target] * k2 / np.maximum(dx * dx + dy * dy, 1e-12)
+    force[:, 0] += np.bincount(nodes, dx * weight, n)
+    force[:, 1] += np.bincount(nodes, dy * weight, n)
+
+    # Дальняя зона: крупные ячейки вне соседних.
+    occupied = np.nonzero(coarse_counts)[0]
+    occupied_x, occupied_y = np.divmod(occupied, coarse_side)
+    mass = coarse_counts[occupied] * k2
+    center_x, center_y = coarse_centers[occupied, 0], coarse_centers[occupied, 1]
+    for start in range(0, n, CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        dx = pos[block, 0, None] - center_x
+        dy = pos[block, 1, None] - center_y
+        near = ((np.abs(coarse_xy[block, 0, None] - occupied_x) <= 1)
+                & (np.abs(coarse_xy[block, 1, None] - occupied_y) <= 1))
+        weight = np.where(near, 0.0, mass / np.maximum(dx * dx + dy * dy, 1e-12))
+        force[block, 0] += (dx * weight).sum(axis=1)
+        force[block, 1] += (dy * weight).sum(axis=1)
+    return force
+
+
+def force_directed(graph, iterations=60, positions=None, temperature=0.1, seed=0):
+    # Раскладка Фрюхтермана-Рейнгольда; отталкивание считается точно для
+    # небольших графов и по сетке для крупных.
+    graph = _as_csr(graph)
+    n = graph.num_vertices
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) if positions is None else np.array(positions, dtype=float)
+    if n <= 1:
+        return np.full((n, 2), 0.5)
+    u, v = _undirected_edges(graph)
+    k = math.sqrt(1.0 / n)
+    k2 = k * k
+    repulsion = _repulsion_exact if n <= EXACT_LIMIT else _repulsion_grid
+
+    for step in range(iterations):
+        force = repulsion(pos, k2)
+        delta = pos[u] - pos[v]
+        length = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        pull = delta * (length / k)[:, None]
+        force[:, 0] -= np.bincount(u, pull[:, 0], n) - np.bincount(v, pull[:, 0], n)
+        force[:, 1] -= np.bincount(u, pull[:, 1], n) - np.bincount(v, pull[:, 1], n)
+
+        limit = temperature * (1 - step / iterations)
+        norm = np.sqrt(np.einsum('ij,ij->i', force, force))
+        pos += force * (np.minimum(norm, limit) / np.maximum(norm, 1e-12))[:, None]
+    return pos
+
+
+def _coarsen(n, u, v, rng):
+    # Случайное максимальное паросочетание: каждая пара вершин сливается в одну.
+    parent = np.full(n, -1, dtype=np.int64)
+    coarse = 0
+    for i in rng.permutation(len(u)):
+        a, b = u[i], v[i]
+        if parent[a] < 0 and parent[b] < 0:
+            parent[a] = parent[b] = coarse
+            coarse += 1
+    single = parent < 0
+    parent[single] = np.arange(coarse, coarse + int(single.sum()))
+    return parent, coarse + int(single.sum())
+
+
+def multilevel(graph, iterations=30, seed=0):
+    graph = _as_csr(graph)
+    n = graph.num_vertices
+    rng = np.random.default_rng(seed)
+    u, v = _undirected_edges(graph)
+    levels = []
+    size = n
+    while size > COARSEST_SIZE:
+        parent, coarse = _coarsen(size, u, v, rng)
+        if coarse > 0.9 * size:
+            break
+        levels.append((size, u, v, parent))
+        cu, cv = parent[u], parent[v]
+        keep = cu != cv
+        pairs = np.unique(np.minimum(cu, cv)[keep] * coarse + np.maximum(cu, cv)[keep])
+        u, v, size = pairs // coarse, pairs % coarse, coarse
+
+    pos = force_directed(_edges_graph(size, u, v), iterations=4 * iterations, seed=seed)
+    temperature = 0.1
+    for fine_size, fine_u, fine_v, parent in reversed(levels):
+        jitter = rng.normal(scale=0.25 * math.sqrt(1.0 / fine_size), size=(fine_size, 2))
+        temperature *= 0.7
+        pos = force_directed(_edges_graph(fine_size, fine_u, fine_v), iterations=iterations,
+                             positions=pos[parent] + jitter, temperature=temperature, seed=seed)
+    return pos
+
+
+def _edges_graph(n, u, v):
+    rows = [[] for _ in range(n)]
+    for a, b in zip(u.tolist(), v.tolist()):
+        rows[a].append((b, 1))
+    return CSRGraph.from_rows(rows)
+
+
+def compute(graph, method='auto', seed=0):
+    graph = _as_csr(graph)
+    if method == 'auto':
+        method = 'multilevel'
+    if method == 'circle':
+        return circle(graph.num_vertices)
+    if method == 'force':
+        return force_directed(graph, seed=seed)
+    if method == 'multilevel':
+        return multilevel(graph, seed=seed)
+    raise ValueError(f"Unknown layout method: {method}")
+
+
+def fit_to_rect(coords, rect, margin=50):
+    # rect = (x, y, width, height); пропорции раскладки сохраняются.
+    if len(coords) == 0:
+        return []
+    low = coords.min(axis=0)
+    span = coords.max(axis=0) - low
+    scale = min((rect[2] - 2 * margin) / max(span[0], 1e-9), (rect[3] - 2 * margin) / max(span[1], 1e-9))
+    center = np.array([rect[0] + rect[2] / 2, rect[1] + rect[3] / 2])
+    screen = center + (coords - low - span / 2) * scale
+    return [(int(x), int(y)) for x, y in screen.tolist()]
+
+
+def layout_positions(graph, rect, method='auto', margin=50, seed=0):
+    # Готовый словарь позиций для algo.draw_graph вместо POSITIONS_*.
+    graph = _as_csr(graph)
+    points = fit_to_rect(compute(graph, method, seed), rect, margin)
+    return {graph.label_of(i): point for i, point in enumerate(points)}
+
+
+class LayoutCache:
+    # Раскладки хранятся по ключу графа; с background=True расчёт идёт в
+    # отдельном потоке, а get возвращает None, пока результат не готов.
+    def __init__(self, method='auto', background=True, max_entries=8):
+        self.method = method
+        self.background = background
+        self.max_entries = max_entries
+        self._results = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _store(self, key, coords):
+        with self._lock:
+            self._pending.discard(key)
+            self._results[key] = coords
+            while len(self._results) > self.max_entries:
+                del self._results[next(iter(self._results))]
+
+    def _run(self, key, graph):
+        try:
+            try:
+                coords = compute(graph, self.method)
+            except Exception:
+                # Ошибка раскладки не должна оставлять окно без рисунка.
+                coords = circle(graph.num_vertices)
+            self._store(key, coords)
+            return coords
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def get(self, key, graph):
+        # graph может быть функцией без аргументов: граф строится только
+        # при первом обращении по ключу.
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+        try:
+            graph = _as_csr(graph() if callable(graph) else graph)
+        except BaseException:
+            with self._lock:
+                self._pending.discard(key)
+            raise
+        if not self.background:
+            return self._run(key, graph)
+        threading.Thread(target=self._run, args=(key, graph), daemon=True).start()
+        return None
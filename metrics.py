@@ -0,0 +1,240 @@
+import atexit
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- Метрики: счётчики, таймеры и время кадров ---
+#
+# По умолчанию выключены. Включаются переменной окружения GRAPH_METRICS
+# (путь к файлу .json или .csv, куда метрики выгружаются при выходе) или
+# вызовом METRICS.enable(). Пока метрики выключены, timer() возвращает
+# общий пустой контекст, а решатели не получают наблюдателя, поэтому их
+# внутренние циклы работают как без инструментирования.
+
+FRAME_HISTORY = 600
+OVERLAY_INTERVAL = 0.5
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.counters = {}
+        self.timers = {}
+        self.frames = deque(maxlen=FRAME_HISTORY)
+        self._lock = threading.Lock()
+        self._overlay = ()
+        self._overlay_time = 0.0
+        self._exporting = False
+
+    def enable(self, path=None):
+        self.enabled = True
+        self.path = path
+        if path is not None and not self._exporting:
+            self._exporting = True
+            atexit.register(self._export_at_exit)
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.frames.clear()
+
+    # --- Запись ---
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self.timers.get(name)
+            if entry is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def timer(self, name):
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def frame(self, seconds):
+        self.frames.append(seconds)
+
+    # --- Чтение и выгрузка ---
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            timers = {name: {'count': count, 'total_ms': total * 1000, 'mean_ms': total / count * 1000,
+                             'max_ms': longest * 1000}
+                      for name, (count, total, longest) in self.timers.items()}
+            frames = sorted(self.frames)
+        result = {'counters': counters, 'timers': timers}
+        if frames:
+            result['frames'] = {
+                'count': len(frames),
+                'mean_ms': sum(frames) / len(frames) * 1000,
+                'p95_ms': frames[min(len(frames) - 1, int(len(frames) * 0.95))] * 1000,
+                'max_ms': frames[-1] * 1000,
+            }
+        return result
+
+    def export(self, path=None):
+        path = path or self.path
+        snapshot = self.snapshot()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'name', 'value', 'count', 'total_ms', 'mean_ms', 'max_ms'])
+                for name, value in sorted(snapshot['counters'].items()):
+                    writer.writerow(['counter', name, value, '', '', '', ''])
+                for name, t in sorted(snapshot['timers'].items()):
+                    writer.writerow(['timer', name, '', t['count'], f"{t['total_ms']:.3f}",
+                                     f"{t['mean_ms']:.3f}", f"{t['max_ms']:.3f}"])
+                if 'frames' in snapshot:
+                    t = snapshot['frames']
+                    writer.writerow(['frames', 'frame', f"{t['p95_ms']:.3f}", t['count'], '',
+                                     f"{t['mean_ms']:.3f}", f"{t['max_ms']:.3f}"])
+        else:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2, ensure_ascii=False)
+
+    def _export_at_exit(self):
+        if self.enabled and self.path is not None:
+            self.export()
+
+    def overlay_lines(self, limit=8):
+        # Текст для окна pygame; обновляется не чаще раза в OVERLAY_INTERVAL,
+        # чтобы не вызывать перерисовку в каждом кадре.
+        now = time.perf_counter()
+        if now - self._overlay_time < OVERLAY_INTERVAL:
+            return self._overlay
+        self._overlay_time = now
+        snapshot = self.snapshot()
+        lines = []
+        if 'frames' in snapshot:
+            t = snapshot['frames']
+            lines.append(f"frame: {t['mean_ms']:.2f} ms avg, p95 {t['p95_ms']:.2f}, max {t['max_ms']:.2f}")
+        slowest = sorted(snapshot['timers'].items(), key=lambda item: -item[1]['total_ms'])
+        for name, t in slowest[:limit // 2]:
+            lines.append(f"{name}: {t['count']} x {t['mean_ms']:.2f} ms")
+        for name, value in sorted(snapshot['counters'].items())[:limit - len(lines)]:
+            lines.append(f"{name}: {value}")
+        self._overlay = tuple(lines)
+        return self._overlay
+
+
+METRICS = Metrics()
+if os.environ.get('GRAPH_METRICS'):
+    METRICS.enable(os.environ['GRAPH_METRICS'])
+
+
+def timed(name):
+    # Декоратор: при выключенных метриках добавляет только одну проверку.
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            with _Timer(METRICS, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Счётчики решателей через хуки наблюдателя ---
+
+class SolverCounters:
+    # Оборачивает наблюдателя решателя (или None). Из хуков восстанавливаются
+    # число вставок в кучу (каждое улучшение расстояния), извлечений,
+    # устаревших извлечений, окончательно найденных вершин и просмотренных
+    # рёбер; время от on_start до on_finish пишется в таймер name.
+    def __init__(self, name, graph, inner=None, metrics=None):
+        self.name = name
+        self.graph = graph
+        self.inner = inner
+        self.metrics = metrics or METRICS
+        self.pushes = self.pops = self.stale = self.settled = self.relaxations = 0
+        self.started = None
+
+    def _degree(self, node):
+        graph = self.graph
+        if hasattr(graph, 'offsets'):
+            i = graph.id_of(node)
+            return graph.offsets[i + 1] - graph.offsets[i]
+        return len(graph.get(node, ()))
+
+    def on_start(self, nodes):
+        self.started = time.perf_counter()
+        self.pushes += 1
+        if self.inner is not None:
+            self.inner.on_start(nodes)
+
+    def on_settle(self, node, distance, changes):
+        self.pops += 1
+        self.settled += 1
+        self.pushes += len(changes) - (1 if self.settled == 1 else 0)
+        self.relaxations += self._degree(node)
+        if self.inner is not None:
+            self.inner.on_settle(node, distance, changes)
+
+    def on_stale(self, node, distance):
+        self.pops += 1
+        self.stale += 1
+        if self.inner is not None:
+            self.inner.on_stale(node, distance)
+
+    def on_finish(self, distances):
+        metrics, name = self.metrics, self.name
+        # Элементы, оставшиеся после последнего on_settle, извлекаются как
+        # устаревшие, так что при исчерпанной очереди вставок столько же,
+        # сколько извлечений.
+        self.pushes = max(self.pushes, self.pops)
+        if self.started is not None:
+            metrics.add_time(name, time.perf_counter() - self.started)
+        for counter in ('pushes', 'pops', 'stale', 'settled', 'relaxations'):
+            metrics.count(f"{name}.{counter}", getattr(self, counter))
+        if self.inner is not None:
+            self.inner.on_finish(distances)
+
+    def on_matrices(self, nodes, dist, next_node):
+        if self.inner is not None:
+            self.inner.on_matrices(nodes, dist, next_node)
+
+    def on_progress(self, done, total):
+        if self.inner is not None:
+            self.inner.on_progress(done, total)
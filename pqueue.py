@@ -0,0 +1,133 @@
+# --- Очереди с приоритетом для алгоритма Дейкстры ---
+#
+# push(item, priority) добавляет элемент или уменьшает его приоритет,
+# pop() возвращает пару (priority, item) с минимальным приоритетом.
+
+
+class IndexedDaryHeap:
+    def __init__(self, arity=4):
+        self.arity = arity
+        self.items = []
+        self.priorities = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def push(self, item, priority):
+        position = self.index.get(item)
+        if position is None:
+            position = len(self.items)
+            self.items.append(item)
+            self.priorities.append(priority)
+            self.index[item] = position
+        elif priority < self.priorities[position]:
+            self.priorities[position] = priority
+        else:
+            return
+        self._sift_up(position)
+
+    def pop(self):
+        items, priorities = self.items, self.priorities
+        top_item, top_priority = items[0], priorities[0]
+        del self.index[top_item]
+        last_item, last_priority = items.pop(), priorities.pop()
+        if items:
+            items[0], priorities[0] = last_item, last_priority
+            self.index[last_item] = 0
+            self._sift_down(0)
+        return top_priority, top_item
+
+    def _sift_up(self, position):
+        items, priorities, index, arity = self.items, self.priorities, self.index, self.arity
+        item, priority = items[position], priorities[position]
+        while position > 0:
+            parent = (position - 1) // arity
+            if priorities[parent] <= priority:
+                break
+            items[position], priorities[position] = items[parent], priorities[parent]
+            index[items[position]] = position
+            position = parent
+        items[position], priorities[position] = item, priority
+        index[item] = position
+
+    def _sift_down(self, position):
+        items, priorities, index, arity = self.items, self.priorities, self.index, self.arity
+        size = len(items)
+        item, priority = items[position], priorities[position]
+        while True:
+            first = position * arity + 1
+            if first >= size:
+                break
+            last = min(first + arity, size)
+            child = first
+            for candidate in range(first + 1, last):
+                if priorities[candidate] < priorities[child]:
+                    child = candidate
+            if priorities[child] >= priority:
+                break
+            items[position], priorities[position] = items[child], priorities[child]
+            index[items[position]] = position
+            position = child
+        items[position], priorities[position] = item, priority
+        index[item] = position
+
+
+class BucketQueue:
+    # Очередь Дайла: кольцо из max_weight + 1 корзин, подходит только для
+    # целых неотрицательных весов, все активные приоритеты лежат в окне
+    # [cursor, cursor + max_weight].
+    def __init__(self, max_weight):
+        if not isinstance(max_weight, int) or max_weight < 0:
+            raise ValueError("Bucket queue requires non-negative integer weights")
+        self.size = max_weight + 1
+        self.buckets = [{} for _ in range(self.size)]
+        self.priorities = {}
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.priorities)
+
+    def __contains__(self, item):
+        return item in self.priorities
+
+    def push(self, item, priority):
+        old = self.priorities.get(item)
+        if old is not None:
+            if priority >= old:
+                return
+            del self.buckets[old % self.size][item]
+        elif not self.priorities:
+            self.cursor = priority
+        self.priorities[item] = priority
+        self.buckets[priority % self.size][item] = None
+
+    def pop(self):
+        buckets, size = self.buckets, self.size
+        while not buckets[self.cursor % size]:
+            self.cursor += 1
+        item, _ = buckets[self.cursor % size].popitem()
+        return self.priorities.pop(item), item
+
+
+def max_weight(weights):
+    result = 0
+    for weight in weights:
+        if not isinstance(weight, int) or weight < 0:
+            raise ValueError("Bucket queue requires non-negative integer weights")
+        if weight > result:
+            result = weight
+    return result
+
+
+def make_queue(kind, weights=()):
+    if not isinstance(kind, str):
+        return kind
+    if kind == 'dary':
+        return IndexedDaryHeap()
+    if kind == 'bucket':
+        return BucketQueue(max_weight(weights))
+    raise ValueError(f"Unknown queue type: {kind}")
@@ -0,0 +1,158 @@
+import math
+
+# --- Равномерная сетка для поиска вершин и рёбер по координатам ---
+#
+# Прямоугольники задаются как (x, y, width, height), подходит и pygame.Rect.
+# Результаты запросов возвращаются в порядке добавления, чтобы по ним можно
+# было рисовать в том же порядке, что и без индекса.
+
+DEFAULT_CELL_SIZE = 64
+
+
+def _intersects(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+        self.order = {}
+        self._counter = 0
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def _cells(self, rect):
+        size = self.cell_size
+        x0, y0 = math.floor(rect[0] / size), math.floor(rect[1] / size)
+        x1, y1 = math.floor((rect[0] + rect[2]) / size), math.floor((rect[1] + rect[3]) / size)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield cx, cy
+
+    def insert(self, key, rect):
+        if key in self.rects:
+            self.remove(key)
+        rect = tuple(rect)
+        self.rects[key] = rect
+        self.order[key] = self._counter
+        self._counter += 1
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, []).append(key)
+
+    def remove(self, key):
+        rect = self.rects.pop(key)
+        del self.order[key]
+        for cell in self._cells(rect):
+            bucket = self.cells[cell]
+            bucket.remove(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def query_rect(self, rect):
+        found = set()
+        for cell in self._cells(rect):
+            for key in self.cells.get(cell, ()):
+                if key not in found and _intersects(self.rects[key], rect):
+                    found.add(key)
+        return sorted(found, key=self.order.__getitem__)
+
+    def query_point(self, pos):
+        cell = (math.floor(pos[0] / self.cell_size), math.floor(pos[1] / self.cell_size))
+        found = [key for key in self.cells.get(cell, ())
+                 if _intersects(self.rects[key], (pos[0], pos[1], 1, 1))]
+        return sorted(found, key=self.order.__getitem__)
+
+
+class PointIndex:
+    # Вершины хранятся в ячейке своего центра; radius - радиус кружка
+    # вершины, по нему проверяются попадания и пересечения с областью.
+    def __init__(self, positions, radius=0, cell_size=None):
+        if cell_size is None:
+            cell_size = 2 * radius if radius > 0 else DEFAULT_CELL_SIZE
+        self.radius = radius
+        self.cell_size = cell_size
+        self.positions = {}
+        self.order = {}
+        self.cells = {}
+        for i, (node, pos) in enumerate(positions.items()):
+            self.positions[node] = pos
+            self.order[node] = i
+            self.cells.setdefault(self._cell(pos), []).append(node)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, pos):
+        return math.floor(pos[0] / self.cell_size), math.floor(pos[1] / self.cell_size)
+
+    def _candidates(self, x0, y0, x1, y1):
+        cx0, cy0 = self._cell((x0, y0))
+        cx1, cy1 = self._cell((x1, y1))
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield from self.cells.get((cx, cy), ())
+
+    def hit(self, pos):
+        r = self.radius
+        best = None
+        for node in self._candidates(pos[0] - r, pos[1] - r, pos[0] + r, pos[1] + r):
+            if math.dist(self.positions[node], pos) <= r:
+                if best is None or self.order[node] < self.order[best]:
+                    best = node
+        return best
+
+    def _ring(self, cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def nearest(self, pos, max_distance=math.inf):
+        best, best_distance = None, max_distance
+
+        def consider(nodes):
+            nonlocal best, best_distance
+            for node in nodes:
+                distance = math.dist(self.positions[node], pos)
+                if distance < best_distance or (distance == best_distance and best is not None
+                                                and self.order[node] < self.order[best]):
+                    best, best_distance = node, distance
+
+        if not self.cells:
+            return None
+        cx, cy = self._cell(pos)
+        xs = [cell[0] for cell in self.cells]
+        ys = [cell[1] for cell in self.cells]
+        max_ring = max(abs(cx - min(xs)), abs(cx - max(xs)), abs(cy - min(ys)), abs(cy - max(ys)))
+        visited = 0
+        for ring in range(max_ring + 1):
+            # Вершины во внешних кольцах не ближе (ring - 1) * cell_size.
+            if (ring - 1) * self.cell_size > best_distance:
+                break
+            visited += max(1, 8 * ring)
+            if visited > len(self.positions):
+                # Пустых ячеек больше, чем вершин: проще перебрать все.
+                consider(self.positions)
+                break
+            for cell in self._ring(cx, cy, ring):
+                consider(self.cells.get(cell, ()))
+        return best
+
+    def query_rect(self, rect):
+        r = self.radius
+        x0, y0 = rect[0] - r, rect[1] - r
+        x1, y1 = rect[0] + rect[2] + r, rect[1] + rect[3] + r
+        found = [node for node in self._candidates(x0, y0, x1, y1)
+                 if x0 <= self.positions[node][0] <= x1 and y0 <= self.positions[node][1] <= y1]
+        return sorted(found, key=self.order.__getitem__)
@@ -0,0 +1,155 @@
+import queue
+import threading
+
+# --- Фоновые вычисления для оконного интерфейса ---
+#
+# У каждой группы задач свой поток, задачи группы выполняются в нём по
+# одной, так что долгий расчёт одной группы (например, матриц Флойда) не
+# задерживает другие. Функция задачи получает именованный аргумент
+# observer: через него решатель сообщает о прогрессе и узнаёт об отмене.
+# Новая задача той же группы отменяет предыдущую.
+
+
+class Cancelled(BaseException):
+    # Наследуется от BaseException, как asyncio.CancelledError, чтобы отмену
+    # не перехватывали обработчики "except Exception" внутри решателей.
+    pass
+
+
+class JobObserver:
+    def __init__(self, job, inner=None):
+        self.job = job
+        self.inner = inner
+
+    def _check(self):
+        if self.job.cancelled:
+            raise Cancelled()
+
+    def on_start(self, nodes):
+        self._check()
+        self.job.total = len(nodes)
+        if self.inner is not None:
+            self.inner.on_start(nodes)
+
+    def on_settle(self, node, distance, changes):
+        self._check()
+        self.job.done += 1
+        if self.inner is not None:
+            self.inner.on_settle(node, distance, changes)
+
+    def on_stale(self, node, distance):
+        self._check()
+        if self.inner is not None:
+            self.inner.on_stale(node, distance)
+
+    def on_finish(self, distances):
+        if self.inner is not None:
+            self.inner.on_finish(distances)
+
+    def on_matrices(self, nodes, dist, next_node):
+        if self.inner is not None:
+            self.inner.on_matrices(nodes, dist, next_node)
+
+    def on_progress(self, done, total):
+        self._check()
+        self.job.done, self.job.total = done, total
+
+
+class Job:
+    PENDING, RUNNING, DONE, FAILED, CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+
+    def __init__(self, func, args, kwargs, group=None, observer=None, tag=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.group = group
+        self.tag = tag
+        self.observer = JobObserver(self, observer)
+        self.state = Job.PENDING
+        self.cancelled = False
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ComputeWorker:
+    def __init__(self):
+        self._finished = queue.Queue()
+        self._groups = {}
+        self._lanes = {}
+
+    def submit(self, func, *args, group=None, observer=None, tag=None, **kwargs):
+        job = Job(func, args, kwargs, group, observer, tag)
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None:
+                previous.cancel()
+            self._groups[group] = job
+        lane = self._lanes.get(group)
+        if lane is None:
+            jobs = queue.Queue()
+            thread = threading.Thread(target=self._run, args=(jobs,), daemon=True)
+            thread.start()
+            lane = self._lanes[group] = (jobs, thread)
+        lane[0].put(job)
+        return job
+
+    def current(self, group):
+        job = self._groups.get(group)
+        return job if job is not None and job.state in (Job.PENDING, Job.RUNNING) else None
+
+    def cancel(self, group):
+        job = self._groups.pop(group, None)
+        if job is not None:
+            job.cancel()
+
+    def _run(self, jobs):
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            if job.cancelled:
+                job.state = Job.CANCELLED
+            else:
+                job.state = Job.RUNNING
+                try:
+                    job.result = job.func(*job.args, observer=job.observer, **job.kwargs)
+                    job.state = Job.DONE
+                except Cancelled:
+                    job.state = Job.CANCELLED
+                except Exception as e:
+                    job.error = e
+                    job.state = Job.FAILED
+            self._finished.put(job)
+
+    def poll(self):
+        # Завершённые задачи забираются в потоке интерфейса; отменённые и
+        # вытесненные более новыми задачами своей группы пропускаются.
+        finished = []
+        while True:
+            try:
+                job = self._finished.get_nowait()
+            except queue.Empty:
+                return finished
+            if job.state == Job.CANCELLED or (job.group is not None and self._groups.get(job.group) is not job):
+                continue
+            if job.group is not None:
+                del self._groups[job.group]
+            finished.append(job)
+
+    def shutdown(self, timeout=1.0):
+        for job in self._groups.values():
+            job.cancel()
+        for jobs, _ in self._lanes.values():
+            jobs.put(None)
+        for _, thread in self._lanes.values():
+            thread.join(timeout)
+        self._lanes.clear()